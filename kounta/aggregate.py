@@ -0,0 +1,147 @@
+"""
+Vectorised aggregation of cashup reconciliations with NumPy
+(`pip install kounta[numpy]`).
+
+Walking Reconciliation, Takings and Adjustments objects for every cashup
+creates several objects per row. Reconciliations instead reads the dicts
+returned by the API once into one NumPy array per column, after which any
+grouping is a handful of array operations.
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+KEYS = ('site_id', 'register_id', 'payment_method_id', 'day')
+
+AMOUNTS = ('recorded', 'counted', 'cash_in', 'cash_out')
+
+
+def _id(obj):
+    return (obj or {}).get('id')
+
+
+class Reconciliations:
+    """
+    The reconciliations of a collection of cashups as columns of NumPy arrays:
+
+     * `site_id`, `register_id` and `payment_method_id` (int64, -1 when
+       missing).
+     * `day` (datetime64[D]): The local date the cashup was created on.
+     * `recorded`, `counted`, `cash_in` and `cash_out` (float64, 0 when
+       missing).
+     * `variance` (float64): `counted` - `recorded`.
+    """
+
+    def __init__(self, cashups):
+        """
+        :param cashups: Cashup objects or the dicts returned by the API.
+        :type cashups: kounta.objects.Cashup[]|dict[]
+        """
+        if numpy is None:
+            raise ImportError('numpy is required for aggregation, install it '
+                              'with: pip install kounta[numpy]')
+
+        values = dict((name, []) for name in KEYS + AMOUNTS)
+        for cashup in cashups:
+            cashup = getattr(cashup, 'obj', cashup)
+            site_id = _id(cashup.get('site'))
+            register_id = _id(cashup.get('register'))
+            day = (cashup.get('created_at') or '')[:10] or 'NaT'
+            for reconciliation in cashup.get('reconciliations') or []:
+                takings = reconciliation.get('takings') or {}
+                adjustments = reconciliation.get('adjustments') or {}
+                values['site_id'].append(site_id)
+                values['register_id'].append(register_id)
+                values['payment_method_id'].append(
+                    _id(reconciliation.get('payment_method')))
+                values['day'].append(day)
+                values['recorded'].append(takings.get('recorded'))
+                values['counted'].append(takings.get('counted'))
+                values['cash_in'].append(adjustments.get('cash_in'))
+                values['cash_out'].append(adjustments.get('cash_out'))
+
+        self.columns = {}
+        for name in ('site_id', 'register_id', 'payment_method_id'):
+            self.columns[name] = numpy.array(
+                [-1 if value is None else value for value in values[name]],
+                dtype=numpy.int64)
+        self.columns['day'] = numpy.array(values['day'],
+                                          dtype='datetime64[D]')
+        for name in AMOUNTS:
+            column = numpy.array(values[name], dtype=numpy.float64)
+            self.columns[name] = numpy.nan_to_num(column)
+        self.columns['variance'] = \
+            self.columns['counted'] - self.columns['recorded']
+
+    def __len__(self):
+        return len(self.columns['variance'])
+
+    def __getattr__(self, item):
+        try:
+            return self.__dict__['columns'][item]
+        except KeyError:
+            raise AttributeError(item)
+
+    def group(self, by=KEYS):
+        """
+        Total the amounts and the variance for each distinct combination of
+        the `by` columns, which are any of KEYS.
+
+        Each group is returned as a dict of its key columns (None for a missing
+        id or day, a date for `day`), `count` (the number of reconciliations)
+        and the sums of `recorded`, `counted`, `cash_in`, `cash_out` and
+        `variance`. Groups are sorted by their keys.
+        :type by: str|str[]
+        :rtype: dict[]
+        """
+        if isinstance(by, str):
+            by = (by,)
+        for name in by:
+            if name not in KEYS:
+                raise ValueError('cannot group by %r' % name)
+
+        if not len(self):
+            return []
+
+        keys = numpy.column_stack([self.columns[name].view(numpy.int64)
+                                   for name in by])
+        groups, inverse = numpy.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        size = len(groups)
+
+        totals = {'count': numpy.bincount(inverse, minlength=size)}
+        for name in AMOUNTS + ('variance',):
+            totals[name] = numpy.bincount(inverse, weights=self.columns[name],
+                                          minlength=size)
+
+        rows = []
+        for i, group in enumerate(groups):
+            row = {}
+            for name, value in zip(by, group):
+                row[name] = self._key(name, value)
+            for name, column in totals.items():
+                row[name] = column[i].item()
+            rows.append(row)
+        return rows
+
+    def _key(self, name, value):
+        if name == 'day':
+            day = numpy.int64(value).view('datetime64[D]')
+            if numpy.isnat(day):
+                return None
+            return day.astype(object)
+        if value == -1:
+            return None
+        return int(value)
+
+
+def variance(cashups, by=KEYS):
+    """
+    Group the reconciliations of `cashups` (see Reconciliations.group()).
+    :type cashups: kounta.objects.Cashup[]|dict[]
+    :type by: str|str[]
+    :rtype: dict[]
+    """
+    return Reconciliations(cashups).group(by)
@@ -0,0 +1,126 @@
+"""
+An asyncio flavour of BasicClient. This module requires Python 3.5 or newer and
+is not imported by the rest of the package.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from kounta.client import BasicClient
+
+
+class AsyncClient(BasicClient):
+    """
+    AsyncClient behaves exactly like BasicClient (including URL caching) except
+    that get_url() is a coroutine and every accessor that has to make a request
+    returns an awaitable instead of the result:
+
+        client = AsyncClient('client_id', 'client_secret')
+        company = await client.company
+        sites = await company.sites
+        cashups = await asyncio.gather(*[site.cashups() for site in sites])
+
+    Accessors that only read data already embedded in an object (for example
+    Cashup.reconciliations) are unchanged. The iter_*() methods and orders()
+    are not awaitable either: they are generators that fetch pages
+    synchronously and block the event loop while they do, so run them in an
+    executor.
+
+    Requests are run on a thread pool sized to the connection pool so that
+    many of them can be in flight on the same event loop at once. Concurrent
+    requests for the same URL share a single fetch.
+    """
+
+    def __init__(self, client_id, client_secret, pool_size=8, executor=None,
+                 **kwargs):
+        """
+        Takes the same arguments as BasicClient.
+        :type client_secret: str
+        :type client_id: str
+        :param pool_size: The maximum number of concurrent requests.
+        :type executor: concurrent.futures.Executor|None
+        """
+        BasicClient.__init__(self, client_id, client_secret,
+                             pool_size=pool_size, **kwargs)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=self._pool.max_size)
+        self._executor = executor
+        self._pending = {}
+        # Reading a field cannot await a request, so embedded objects are
+        # never hydrated.
+        self.hydrate = False
+
+    async def get_url(self, url):
+        """
+        Get a URL (API endpoint). This makes use of URL caching (see
+        BasicClient).
+        :type url: string
+        :rtype: dict
+        """
+        value = self._cache[url]
+        if value is not None:
+            return value
+
+        pending = self._pending.get(url)
+        if pending is None:
+            self.fetches += 1
+            pending = asyncio.ensure_future(self._load(url))
+            self._pending[url] = pending
+            pending.add_done_callback(lambda f: self._pending.pop(url, None))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(pending)
+
+    async def get_urls(self, urls, max_workers=None):
+        """
+        Get many URLs concurrently, at most `max_workers` at a time if it is
+        set. The results are returned in the same order as `urls`.
+        :type urls: str[]
+        :type max_workers: int|None
+        :rtype: dict[]
+        """
+        if max_workers is None:
+            return list(await asyncio.gather(*[self.get_url(url)
+                                               for url in urls]))
+
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def get_url(url):
+            async with semaphore:
+                return await self.get_url(url)
+
+        return list(await asyncio.gather(*[get_url(url) for url in urls]))
+
+    async def _load(self, url):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor,
+                                          self._fetch_and_cache, url)
+
+    def _map_url(self, url, callback):
+        async def fetch():
+            result = callback(await self.get_url(url))
+            # The callback may itself fetch more (see Company.stock_levels()).
+            if asyncio.iscoroutine(result):
+                result = await result
+            return result
+        return fetch()
+
+    def _map_urls(self, urls, callback, max_workers=None):
+        async def fetch():
+            return callback(await self.get_urls(urls, max_workers))
+        return fetch()
+
+    def _map_index(self, url, callback):
+        async def find():
+            index = self._cached_index(url)
+            if index is None:
+                index = self._build_index(url, await self.get_url(url))
+            return callback(index)
+        return find()
+
+    def close(self):
+        """
+        Close the connections and worker threads held by this client.
+        """
+        self._executor.shutdown(wait=False)
+        BasicClient.close(self)
@@ -1,11 +1,27 @@
 import base64
 import json
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from multiprocessing.pool import ThreadPool
+from kounta import jsonstream, ratelimit
 from kounta.objects import Company
+from kounta.transport import ConnectionPool
 
 try:
     import urllib.request as urllib2
+    from urllib.parse import urlsplit
 except ImportError:
     import urllib2
+    from urlparse import urlsplit
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 
 class BasicClient:
     """
@@ -15,43 +31,484 @@ class BasicClient:
     This is particularly useful when doing lots of calls on the same or similar
     data. However, this may cause an issue when you update data through the API
     and get the old cached data returned the next time that endpoint is
-    requested. So you can erase all cache with the reset_cache() method.
+    requested. So you can erase all cache with the reset_cache() method, or
+    pass in a URLCache that bounds the number of entries and how long they
+    live.
+
+    Requests are sent over a pool of keep-alive connections and paced by a
+    token bucket shared by every client with the same client ID. A client can
+    be shared between threads.
     """
-    def __init__(self, client_id, client_secret):
+
+    host = 'api.kounta.com'
+    retry_statuses = (429, 503)
+
+    def __init__(self, client_id, client_secret, pool_size=4, idle_timeout=30,
+                 pool=None, cache=None, rate_limit=None, burst=None,
+                 max_retries=5, bucket=None, hydrate=True):
         """
         :type client_secret: str
         :type client_id: str
+        :param pool_size: The maximum number of open connections.
+        :param idle_timeout: Seconds before an unused connection is closed.
+        :type pool: ConnectionPool|None
+        :type cache: URLCache|None
+        :param rate_limit: Requests per second, or None to share the limit
+            of other clients with the same ID. Clients that set limits must
+            all set the same ones, or ValueError is raised.
+        :param burst: The largest burst of requests.
+        :param max_retries: How many times a request answered with 429 or 503
+            is retried, after the Retry-After period or a backoff.
+        :param bucket: Use this bucket instead of the one for `client_id`.
+        :type bucket: kounta.ratelimit.TokenBucket|None
+        :param hydrate: Complete embedded objects from their list endpoint
+            when a missing field is read (see kounta.objects.BaseObject).
         """
+        if bucket is None:
+            bucket = ratelimit.shared_bucket(client_id, rate_limit, burst)
+        self._bucket = bucket
         self.client_id = client_id
         self.client_secret = client_secret
-        self._cache = URLCache()
+        if cache is None:
+            cache = URLCache()
+        self._cache = cache
+        if pool is None:
+            pool = ConnectionPool(self.host, max_size=pool_size,
+                                  idle_timeout=idle_timeout)
+        self._pool = pool
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._indexes = {}
+        self._identities = weakref.WeakValueDictionary()
+        self._identities_lock = threading.Lock()
+        self.hydrate = hydrate
+        self.fetches = 0
+        self.coalesced = 0
+        self.max_retries = max_retries
+        self.throttled = 0
 
-    def _fetch_url(self, url):
+    def _fetch_url(self, url, headers=None):
         """
         This is an internal method, if you need to download an arbitrary
         endpoint, see get_url()
 
-        :rtype : dict
+        :rtype : kounta.transport.Response
         :param url: str
+        :param headers: Extra request headers.
         """
-        encoded = base64.b64encode(self.client_id + ':' + self.client_secret)
-        headers = {
-            "Authorization": "Basic " + encoded
+        credentials = '%s:%s' % (self.client_id, self.client_secret)
+        encoded = base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+        request_headers = {
+            "Authorization": "Basic " + encoded,
+            "Accept-Encoding": "gzip, deflate",
         }
-        request = urllib2.Request('https://api.kounta.com' + url,
-                                  headers=headers)
-        return urllib2.urlopen(request).read()
+        request_headers.update(headers or {})
+
+        attempt = 0
+        while True:
+            self._bucket.acquire()
+            response = self._pool.request('GET', url, request_headers,
+                                          stream=True)
+            if response.status not in self.retry_statuses or \
+                    attempt >= self.max_retries:
+                break
+
+            response.close()
+            delay = ratelimit.retry_after(response.headers.get('retry-after'))
+            if delay is None:
+                delay = ratelimit.backoff(attempt)
+            self._bucket.pause(delay)
+            self.throttled += 1
+            attempt += 1
+
+        if response.status >= 400:
+            response.close()
+            raise urllib2.HTTPError('https://%s%s' % (self.host, url),
+                                    response.status, response.reason,
+                                    response.headers, None)
+        return response
 
     def get_url(self, url):
         """
         Get a URL (API endpoint). This makes use of URL caching (see class
-        description).
+        description). When several threads miss the cache for the same URL
+        only one of them makes the request and the others share its result;
+        `fetches` and `coalesced` count both. Entities embedded in a cached response are shared with
+        the other responses they appear in once they have been wrapped in an
+        object, so they may hold fields that this response did not have (see
+        kounta.objects.BaseObject).
         :type url: string
         :rtype: dict
         """
-        if self._cache[url] is None:
-            self._cache[url] = json.loads(self._fetch_url(url))
-        return self._cache[url]
+        value = self._cache[url]
+        if value is None:
+            value = self._single_flight(url)
+        return value
+
+    def _single_flight(self, url):
+        """
+        Fetch a URL that missed the cache, unless another thread is already
+        fetching it, in which case wait for and share that result.
+        :type url: str
+        :rtype: dict
+        """
+        with self._flights_lock:
+            flight = self._flights.get(url)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[url] = flight
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            # Another thread may have finished fetching this URL between our
+            # cache miss and taking the lock. The miss has been counted
+            # already.
+            flight.value = self._cache.peek(url)
+            if flight.value is None:
+                with self._flights_lock:
+                    self.fetches += 1
+                flight.value = self._fetch_and_cache(url)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[url]
+            flight.done.set()
+
+    def _fetch_and_cache(self, url):
+        """
+        Download a URL that is not in the cache, or revalidate it if the cache
+        holds an expired copy with validators, and store the result.
+        :type url: str
+        :rtype: dict
+        """
+        stale = self._cache.stale(url)
+        if stale is None:
+            response = self._fetch_url(url)
+        else:
+            value, etag, last_modified = stale
+            headers = {}
+            if etag is not None:
+                headers['If-None-Match'] = etag
+            if last_modified is not None:
+                headers['If-Modified-Since'] = last_modified
+            response = self._fetch_url(url, headers)
+            if response.status == 304:
+                response.close()
+                self._cache.touch(url)
+                return value
+
+        # The body is decompressed and decoded as it arrives rather than
+        # being read into one string first.
+        value = jsonstream.decode(response.iter_chunks())
+        size = response.size
+        headers = response.headers
+
+        etag = headers.get('etag')
+        last_modified = headers.get('last-modified')
+
+        # A paged list is cached as a whole, under the URL of its first page.
+        # The validators of the first page say nothing about the later ones,
+        # so the list is downloaded again once it expires.
+        next_url = self._next_page(response)
+        if next_url is not None and isinstance(value, list):
+            etag = last_modified = None
+        while next_url is not None and isinstance(value, list):
+            response = self._fetch_url(next_url)
+            value.extend(jsonstream.decode(response.iter_chunks()))
+            size += response.size
+            next_url = self._next_page(response)
+
+        self._cache.set(url, value, size, etag=etag,
+                        last_modified=last_modified)
+        return value
+
+    def _next_page(self, response):
+        """
+        The URL of the next page of a list endpoint, taken from the
+        X-Next-Page header or a Link header with rel="next", or None if this is
+        the last page.
+        :type response: kounta.transport.Response
+        :rtype: str|None
+        """
+        url = response.headers.get('x-next-page')
+        if not url:
+            match = _next_link.search(response.headers.get('link', ''))
+            if match is None:
+                return None
+            url = match.group(1)
+
+        parts = urlsplit(url)
+        if parts.query:
+            return '%s?%s' % (parts.path, parts.query)
+        return parts.path
+
+    def _pages(self, url):
+        while url is not None:
+            response = self._fetch_url(url)
+            page = jsonstream.decode(response.iter_chunks())
+            url = self._next_page(response)
+            yield page
+
+    def iter_pages(self, url, read_ahead=0):
+        """
+        Yield each page of a list endpoint as a list, following the next page
+        headers (see _next_page()) until the last page. Pages are not cached.
+
+        With `read_ahead` set, up to that many of the following pages are
+        fetched on a background thread while the current one is being
+        processed, so that the consumer does not wait on the network for each
+        page. At most `read_ahead` + 1 pages are held in memory.
+        :type url: str
+        :type read_ahead: int
+        :rtype: list[]
+        """
+        if read_ahead <= 0:
+            return self._pages(url)
+        return _ReadAhead(self._pages(url), read_ahead).iter()
+
+    def iter_url(self, url, limit=None, read_ahead=0, stream=False):
+        """
+        Yield the items of a list endpoint one at a time, fetching further
+        pages only as they are needed (or `read_ahead` pages ahead, see
+        iter_pages()). At most `limit` items are yielded.
+
+        With `stream` set each item is yielded as soon as it has been received
+        and decoded (see stream_url()) rather than once its page is complete.
+        :type url: str
+        :type limit: int|None
+        :type read_ahead: int
+        :type stream: bool
+        :rtype: dict[]
+        """
+        if stream and read_ahead:
+            raise ValueError('read_ahead cannot be combined with stream')
+
+        if stream:
+            items = self.stream_url(url)
+        else:
+            items = (item for page in self.iter_pages(url, read_ahead)
+                     for item in page)
+        return _limit(items, limit)
+
+    def stream_url(self, url):
+        """
+        Yield the items of a list endpoint while the response is still being
+        downloaded, following the next page headers (see _next_page()). Only
+        the item being received is held in memory, however large the response
+        is, so nothing is cached.
+        :type url: str
+        :rtype: dict[]
+        """
+        while url is not None:
+            response = self._fetch_url(url)
+            chunks = response.iter_chunks()
+            try:
+                for item in jsonstream.iter_array(chunks):
+                    yield item
+            finally:
+                # Drops the connection if the consumer stopped part way.
+                chunks.close()
+                response.close()
+            url = self._next_page(response)
+
+    def iter_urls(self, urls, max_workers=None):
+        """
+        Yield the items of several list endpoints, one endpoint after the other
+        in the order of `urls`, while fetching up to `max_workers` of them in
+        parallel (by default, one for each connection the client may open).
+        Only the endpoints being fetched or waiting to be consumed are held in
+        memory. Like iter_url() this does not cache.
+        :type urls: str[]
+        :type max_workers: int|None
+        :rtype: dict[]
+        """
+        if max_workers is None:
+            max_workers = self._pool.max_size
+        max_workers = max(1, max_workers)
+
+        def fetch(url):
+            return list(self.iter_url(url))
+
+        urls = iter(urls)
+        workers = ThreadPool(max_workers)
+        pending = deque()
+        try:
+            for url in urls:
+                pending.append(workers.apply_async(fetch, (url,)))
+                if len(pending) == max_workers:
+                    break
+
+            while pending:
+                items = pending.popleft().get()
+                for url in urls:
+                    pending.append(workers.apply_async(fetch, (url,)))
+                    break
+                for item in items:
+                    yield item
+        finally:
+            workers.terminate()
+            workers.join()
+
+    def get_urls(self, urls, max_workers=None):
+        """
+        Get many URLs at once. URLs that are not already cached are fetched in
+        parallel on a pool of `max_workers` threads (by default, one for each
+        connection the client may open) and stored in the cache. The results
+        are returned in the same order as `urls`.
+        :type urls: str[]
+        :type max_workers: int|None
+        :rtype: dict[]
+        """
+        results = {}
+        missing = []
+        for url in urls:
+            if url in results:
+                continue
+            results[url] = self._cache[url]
+            if results[url] is None:
+                missing.append(url)
+
+        if missing:
+            if max_workers is None:
+                max_workers = self._pool.max_size
+            workers = ThreadPool(max(1, min(max_workers, len(missing))))
+            try:
+                # The misses have been counted already.
+                fetched = workers.map(self._single_flight, missing)
+            finally:
+                workers.close()
+                workers.join()
+            results.update(zip(missing, fetched))
+
+        return [results[url] for url in urls]
+
+    def _map_url(self, url, callback):
+        """
+        Fetch a URL and return the result of passing the decoded JSON to
+        `callback`. Objects fetch all endpoints through this method so that
+        kounta.aio.AsyncClient can return an awaitable in its place.
+        :type url: str
+        :type callback: callable
+        """
+        return callback(self.get_url(url))
+
+    def _map_urls(self, urls, callback, max_workers=None):
+        """
+        Like _map_url() for several URLs fetched at once (see get_urls()).
+        :type urls: str[]
+        :type callback: callable
+        :type max_workers: int|None
+        """
+        return callback(self.get_urls(urls, max_workers))
+
+    def _cached_index(self, url):
+        """
+        The index of the list endpoint `url` by ID, or None if it has to be
+        built (again). An index is kept for as long as the cache holds the
+        same version of the list (see URLCache.version()), so a lookup neither
+        fetches nor decodes the list, even from a persistent cache.
+        :type url: str
+        :rtype: dict|None
+        """
+        index = self._indexes.get(url)
+        if index is None:
+            return None
+        version = self._cache.version(url)
+        if version is None or version != index[0]:
+            # The list has been dropped or replaced; so must its items be.
+            self._indexes.pop(url, None)
+            return None
+        return index[1]
+
+    def _build_index(self, url, items):
+        """
+        Index `items`, just fetched from the list endpoint `url`, by ID.
+        :type url: str
+        :type items: dict[]
+        :rtype: dict
+        """
+        index = dict((item['id'], item) for item in items)
+        version = self._cache.version(url)
+        if version is not None:
+            self._indexes[url] = (version, index)
+        # Drop the indexes of lists the cache has evicted or expired since, so
+        # that they do not keep the items in memory.
+        for other, kept in list(self._indexes.items()):
+            if other != url and kept[0] != self._cache.version(other):
+                self._indexes.pop(other, None)
+        return index
+
+    def _map_index(self, url, callback):
+        """
+        Return the result of passing the index by ID of the list endpoint
+        `url` to `callback`, fetching the list if it is not indexed yet. Like
+        _map_url() this is replaced by kounta.aio.AsyncClient.
+        :type url: str
+        :type callback: callable
+        """
+        index = self._cached_index(url)
+        if index is None:
+            index = self._build_index(url, self.get_url(url))
+        return callback(index)
+
+    def _identify(self, cls, obj, company, fetched=False):
+        """
+        Return the one instance of `cls` for the entity with the ID in `obj`,
+        creating it if there is none. `obj` without an ID is simply wrapped.
+        Instances are held weakly, so an entity is forgotten once nothing
+        refers to it.
+
+        When the entity is already known the fields of `obj` are merged into
+        its dict, which the caller should use in place of `obj`. A `fetched`
+        dict comes from the entity's own endpoint and replaces existing fields;
+        one that was embedded in another response only fills in fields that are
+        missing, since embedded copies are often partial.
+        :type cls: type
+        :type obj: dict
+        :type company: kounta.objects.Company|None
+        :type fetched: bool
+        :rtype: kounta.objects.BaseObject
+        """
+        if not isinstance(obj, dict) or obj.get('id') is None:
+            return cls(obj, self, company)
+
+        key = (cls, obj['id'])
+        with self._identities_lock:
+            instance = self._identities.get(key)
+            if instance is None:
+                instance = cls(obj, self, company)
+                if not fetched and self.hydrate:
+                    instance._make_stub()
+                self._identities[key] = instance
+                return instance
+
+            shared = instance._obj
+            if shared is not obj:
+                if fetched:
+                    shared.update(obj)
+                    # Nested objects may have been built from old fields.
+                    instance._memo = None
+                else:
+                    for name, value in obj.items():
+                        if name not in shared:
+                            shared[name] = value
+            return instance
+
+    def _drop_indexes(self, prefix=''):
+        for url in list(self._indexes):
+            if url.startswith(prefix):
+                self._indexes.pop(url, None)
 
     @property
     def company(self):
@@ -60,23 +517,432 @@ class BasicClient:
         Company object will expose more methods to fetch further endpoints.
         :rtype : Company
         """
-        return Company(self.get_url('/v1/companies/me.json'), self, None)
+        return self._map_url('/v1/companies/me.json',
+                             lambda obj: self._identify(Company, obj, None,
+                                                        True))
 
     def reset_cache(self):
         """
-        This is a crude way or handling the dropping of all cache.
+        This is a crude way or handling the dropping of all cache. The limits
+        and statistics of the cache are kept.
 
-        In this future there should be a way of selectively deleting cache.
+        To only drop the cache for part of the API see invalidate() and
+        invalidate_prefix().
         """
-        self._cache = URLCache()
+        self._cache.clear()
+        self._drop_indexes()
 
+    def invalidate_prefix(self, prefix):
+        """
+        Drop the cache for every URL starting with `prefix`, for example
+        '/v1/companies/5678/sites/42/'.
+        :type prefix: str
+        :rtype: int
+        :return: The number of cached URLs dropped.
+        """
+        self._drop_indexes(prefix)
+        return self._cache.invalidate_prefix(prefix)
+
+    def invalidate(self, obj):
+        """
+        Drop the cache for an object (such as a Site or Register) and for every
+        endpoint beneath it, like its cashups and categories. List endpoints
+        that include the object, like the company's sites, are kept.
+        :type obj: kounta.objects.BaseObject
+        :rtype: int
+        :return: The number of cached URLs dropped.
+        """
+        url = obj._resource_url
+        if url is None:
+            raise ValueError('%s has no endpoint of its own' %
+                             type(obj).__name__)
+
+        self._drop_indexes(url + '/')
+        count = self._cache.invalidate_prefix(url + '/')
+        if url + '.json' in self._cache:
+            del self._cache[url + '.json']
+            count += 1
+        return count
+
+    def close(self):
+        """
+        Close the connections held by this client. The client must not be used
+        afterwards.
+        """
+        self._pool.close()
+
+
+_next_link = re.compile(r'<([^>]+)>\s*;\s*rel="?next"?')
+
+
+def _limit(items, limit):
+    """
+    Yield at most `limit` (None for no limit) of `items`, closing the source as
+    soon as the limit has been reached.
+    """
+    try:
+        if limit is not None and limit <= 0:
+            return
+
+        count = 0
+        for item in items:
+            yield item
+            count += 1
+            if count == limit:
+                return
+    finally:
+        items.close()
+
+
+class _ReadAhead:
+    """
+    Consumes a generator on a background thread, keeping up to `depth` of its
+    values waiting in a queue or being produced.
+    """
+
+    def __init__(self, generator, depth):
+        self._generator = generator
+        self._queue = queue.Queue()
+        # A slot is taken before each value is produced and given back when
+        # the consumer takes it, so a value is never produced (or a page
+        # fetched) without room for it.
+        self._slots = queue.Queue(depth)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        name='kounta-read-ahead')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _take_slot(self):
+        # Wait for room unless the consumer has gone away.
+        while not self._stopped.is_set():
+            try:
+                self._slots.put(None, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self):
+        try:
+            while self._take_slot():
+                try:
+                    value = next(self._generator)
+                except StopIteration:
+                    self._queue.put((False, None))
+                    return
+                self._queue.put((True, value))
+        except Exception as e:
+            self._queue.put((False, e))
+        finally:
+            self._generator.close()
+
+    def iter(self):
+        try:
+            while True:
+                more, value = self._queue.get()
+                if not more:
+                    if value is not None:
+                        raise value
+                    return
+                self._slots.get_nowait()
+                yield value
+        finally:
+            self._stopped.set()
+
+
+class _Flight:
+    """
+    A request in progress that other threads can wait on.
+    """
 
-class URLCache:
     def __init__(self):
-        self.cache = {}
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class URLCache:
+    """
+    URLCache holds the decoded JSON for each URL fetched by a client. It is safe
+    to share between threads.
+
+    By default it is unbounded and entries never expire. It can be bounded by
+    the number of entries (`max_entries`) and/or by the total size of the
+    responses in bytes (`max_bytes`), in which case the least recently used
+    entries are evicted first. Entries older than `ttl` seconds are dropped
+    when they are next looked up, unless they carry an ETag or Last-Modified
+    validator: those are kept (see stale()) so that the client can revalidate
+    them. Entries can also be dropped selectively with invalidate_prefix().
+
+    The hits, misses, evictions, expirations and revalidations counters can be
+    used to size the cache, see stats().
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, ttl=None):
+        """
+        :type max_entries: int|None
+        :type max_bytes: int|None
+        :param ttl: Seconds an entry stays valid for, or None for forever.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.cache = OrderedDict()
+        self.index = PrefixIndex()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.revalidations = 0
+        self._version = 0
+        self._lock = threading.RLock()
 
     def __getitem__(self, item):
-        return self.cache.get(item, None)
+        with self._lock:
+            entry = self.cache.get(item, None)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires, etag, last_modified, version = entry
+            if expires is not None and expires <= time.time():
+                if etag is None and last_modified is None:
+                    self._remove(item)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            del self.cache[item]
+            self.cache[item] = entry
+            self.hits += 1
+            return value
 
     def __setitem__(self, key, value):
-        self.cache[key] = value
+        self.set(key, value)
+
+    def peek(self, key):
+        """
+        Return the value for `key` if it is fresh, or None, without counting a
+        hit or miss or making it the most recently used entry.
+        :type key: str
+        """
+        with self._lock:
+            entry = self.cache.get(key, None)
+            if entry is None or (entry[2] is not None and
+                                 entry[2] <= time.time()):
+                return None
+            return entry[0]
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def __len__(self):
+        with self._lock:
+            return len(self.cache)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self.cache
+
+    def set(self, key, value, size=None, etag=None, last_modified=None):
+        """
+        Store a value. `size` is the number of bytes the response took up; if
+        it is not known and the cache is bounded by `max_bytes` it is
+        estimated from the JSON encoded value.
+        :type key: str
+        :type size: int|None
+        :param etag: The ETag header of the response.
+        :param last_modified: The Last-Modified header of the response.
+        """
+        if size is None:
+            size = len(json.dumps(value)) if self.max_bytes else 0
+
+        expires = None
+        if self.ttl is not None:
+            expires = time.time() + self.ttl
+
+        with self._lock:
+            if key in self.cache:
+                self._remove(key)
+            self._version += 1
+            self.cache[key] = (value, size, expires, etag, last_modified,
+                               self._version)
+            self.index.add(key)
+            self.size += size
+            self._evict()
+
+    def stale(self, key):
+        """
+        Return an entry that has expired but can be revalidated as a tuple of
+        (value, etag, last_modified), or None.
+        :type key: str
+        :rtype: tuple|None
+        """
+        entry = self.cache.get(key, None)
+        if entry is None or (entry[3] is None and entry[4] is None):
+            return None
+        return entry[0], entry[3], entry[4]
+
+    def version(self, key):
+        """
+        A number that stays the same for as long as the same response is
+        cached for `key`, or None if there is no fresh entry. Every response
+        stored gets a new number. It is used to keep indexes of cached lists
+        without looking the list up again.
+        :type key: str
+        """
+        with self._lock:
+            entry = self.cache.get(key, None)
+            if entry is None or (entry[2] is not None and
+                                 entry[2] <= time.time()):
+                return None
+            return entry[5]
+
+    def touch(self, key):
+        """
+        Mark an entry as fresh again after the server confirmed that it has not
+        been modified.
+        :type key: str
+        """
+        with self._lock:
+            entry = self.cache.get(key, None)
+            if entry is None:
+                # Evicted while it was being revalidated.
+                return
+            if self.ttl is not None:
+                self.cache[key] = (entry[0], entry[1], time.time() + self.ttl,
+                                   entry[3], entry[4], entry[5])
+            self.revalidations += 1
+
+    def _remove(self, key):
+        # Must be called while holding self._lock.
+        entry = self.cache.pop(key, None)
+        if entry is not None:
+            self.index.remove(key)
+            self.size -= entry[1]
+
+    def _evict(self):
+        # Must be called while holding self._lock.
+        while self.cache and (
+                (self.max_entries is not None and
+                 len(self.cache) > self.max_entries) or
+                (self.max_bytes is not None and self.size > self.max_bytes)):
+            key, entry = self.cache.popitem(last=False)
+            self.index.remove(key)
+            self.size -= entry[1]
+            self.evictions += 1
+
+    def invalidate_prefix(self, prefix):
+        """
+        Drop every entry whose URL starts with `prefix`, for example
+        '/v1/companies/5678/sites/42/'. When the prefix ends with a '/' the cost
+        is proportional to the number of entries removed rather than to the
+        size of the cache.
+        :type prefix: str
+        :rtype: int
+        :return: The number of entries removed.
+        """
+        with self._lock:
+            keys = self.index.pop_prefix(prefix)
+            for key in keys:
+                entry = self.cache.pop(key)
+                self.size -= entry[1]
+            return len(keys)
+
+    def clear(self):
+        """
+        Drop every entry. The statistics are kept.
+        """
+        with self._lock:
+            self.cache.clear()
+            self.index = PrefixIndex()
+            self.size = 0
+
+    def stats(self):
+        """
+        :rtype: dict
+        """
+        with self._lock:
+            return {
+                'entries': len(self.cache),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'revalidations': self.revalidations,
+            }
+
+
+class PrefixIndex:
+    """
+    A trie of URL path segments used by URLCache to find every key under a
+    prefix without scanning the whole cache. Empty branches are pruned as keys
+    are removed so that walking a branch only visits nodes that lead to a key.
+    """
+
+    def __init__(self):
+        self.root = ({}, set())
+
+    def add(self, key):
+        """
+        :type key: str
+        """
+        node = self.root
+        for segment in key.split('/'):
+            node = node[0].setdefault(segment, ({}, set()))
+        node[1].add(key)
+
+    def remove(self, key):
+        """
+        :type key: str
+        """
+        path = [self.root]
+        segments = key.split('/')
+        for segment in segments:
+            node = path[-1][0].get(segment)
+            if node is None:
+                return
+            path.append(node)
+
+        path[-1][1].discard(key)
+        for segment, node, parent in reversed(list(zip(segments, path[1:],
+                                                       path))):
+            if node[0] or node[1]:
+                break
+            del parent[0][segment]
+
+    def pop_prefix(self, prefix):
+        """
+        Remove and return every key that starts with `prefix`.
+        :type prefix: str
+        :rtype: str[]
+        """
+        segments = prefix.split('/')
+        node = self.root
+        for segment in segments[:-1]:
+            node = node[0].get(segment)
+            if node is None:
+                return []
+
+        # The last segment may be partial, so it matches any child starting
+        # with it.
+        last = segments[-1]
+        keys = []
+        for segment, child in list(node[0].items()):
+            if segment.startswith(last):
+                self._collect(child, keys)
+        for key in keys:
+            self.remove(key)
+
+        return keys
+
+    def _collect(self, node, keys):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            keys.extend(node[1])
+            stack.extend(node[0].values())
@@ -0,0 +1,207 @@
+"""
+Exporting cashups as typed columnar batches for analytics, written as Parquet
+or Arrow IPC files. This needs pyarrow (`pip install kounta[arrow]`).
+
+Each cashup is split into three tables:
+
+ * `cashups`: one row per cashup.
+ * `reconciliations`: one row per reconciliation, with its Takings and
+   Adjustments.
+ * `income_accounts`: one row per IncomeAccountAmount.
+
+Column types follow the documented types of the object properties: ids are
+int64, amounts float64 and `created_at` a UTC timestamp. Rows are collected
+`batch_size` at a time, so memory use is bounded by the batch size rather than
+the number of cashups.
+"""
+
+from kounta.iso8601 import parse
+import os
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+_cashup_key = (('cashup_id', 'int'), ('site_id', 'int'),
+               ('register_id', 'int'), ('created_at', 'datetime'))
+
+COLUMNS = {
+    'cashups': (
+        ('id', 'int'), ('number', 'int'), ('processed', 'bool'),
+        ('register_level_reconciliation', 'bool'), ('register_id', 'int'),
+        ('site_id', 'int'), ('staff_member_id', 'int'),
+        ('created_at', 'datetime'),
+    ),
+    'reconciliations': _cashup_key + (
+        ('payment_method_id', 'int'), ('payment_method', 'str'),
+        ('ledger_code', 'str'), ('recorded', 'float'), ('counted', 'float'),
+        ('cash_in', 'float'), ('cash_out', 'float'),
+    ),
+    'income_accounts': _cashup_key + (
+        ('ledger_code', 'str'), ('tax_id', 'int'), ('net', 'float'),
+        ('tax', 'float'),
+    ),
+}
+
+
+def _require():
+    if pyarrow is None:
+        raise ImportError('pyarrow is required for columnar export, install '
+                          'it with: pip install kounta[arrow]')
+
+
+def _id(obj):
+    return (obj or {}).get('id')
+
+
+def _datetime(value):
+    if value is None:
+        return None
+    return parse(value)
+
+
+def _rows(cashup):
+    """
+    Split one cashup dict into its rows, as (table, values) pairs in the order
+    of COLUMNS.
+    """
+    created_at = _datetime(cashup.get('created_at'))
+    site_id = _id(cashup.get('site'))
+    register_id = _id(cashup.get('register'))
+    key = (cashup['id'], site_id, register_id, created_at)
+
+    yield 'cashups', (
+        cashup['id'], cashup.get('number'), cashup.get('processed'),
+        cashup.get('register_level_reconciliation'), register_id, site_id,
+        _id(cashup.get('staff_member')), created_at)
+
+    for reconciliation in cashup.get('reconciliations') or []:
+        method = reconciliation.get('payment_method') or {}
+        takings = reconciliation.get('takings') or {}
+        adjustments = reconciliation.get('adjustments') or {}
+        yield 'reconciliations', key + (
+            method.get('id'), method.get('name'), method.get('ledger_code'),
+            takings.get('recorded'), takings.get('counted'),
+            adjustments.get('cash_in'), adjustments.get('cash_out'))
+
+    for account in cashup.get('income_accounts') or []:
+        for amount in account.get('amounts') or []:
+            yield 'income_accounts', key + (
+                account.get('ledger_code'), amount.get('tax_id'),
+                amount.get('net'), amount.get('tax'))
+
+
+def iter_columns(cashups, batch_size=65536):
+    """
+    Yield (table, columns) pairs, where columns is a list of value lists in the
+    order of COLUMNS[table], holding at most `batch_size` rows each. This does
+    not need pyarrow.
+    :param cashups: Cashup objects or the dicts returned by the API.
+    :type cashups: kounta.objects.Cashup[]|dict[]
+    :type batch_size: int
+    :rtype: (str, list[])[]
+    """
+    pending = dict((table, [[] for column in columns])
+                   for table, columns in COLUMNS.items())
+    counts = dict.fromkeys(COLUMNS, 0)
+
+    for cashup in cashups:
+        cashup = getattr(cashup, 'obj', cashup)
+        for table, values in _rows(cashup):
+            columns = pending[table]
+            for column, value in zip(columns, values):
+                column.append(value)
+            counts[table] += 1
+            if counts[table] == batch_size:
+                yield table, columns
+                pending[table] = [[] for column in columns]
+                counts[table] = 0
+
+    for table in sorted(COLUMNS):
+        if counts[table]:
+            yield table, pending[table]
+
+
+def schema(table):
+    """
+    The Arrow schema of one of the tables in COLUMNS.
+    :type table: str
+    :rtype: pyarrow.Schema
+    """
+    _require()
+    types = {
+        'int': pyarrow.int64(),
+        'float': pyarrow.float64(),
+        'bool': pyarrow.bool_(),
+        'str': pyarrow.string(),
+        'datetime': pyarrow.timestamp('us', tz='UTC'),
+    }
+    return pyarrow.schema([(name, types[kind])
+                           for name, kind in COLUMNS[table]])
+
+
+def iter_batches(cashups, batch_size=65536):
+    """
+    Yield (table, pyarrow.RecordBatch) pairs for `cashups` (see
+    iter_columns()).
+    :type cashups: kounta.objects.Cashup[]|dict[]
+    :type batch_size: int
+    :rtype: (str, pyarrow.RecordBatch)[]
+    """
+    _require()
+    schemas = dict((table, schema(table)) for table in COLUMNS)
+    for table, columns in iter_columns(cashups, batch_size):
+        table_schema = schemas[table]
+        arrays = [pyarrow.array(column, type=field.type)
+                  for column, field in zip(columns, table_schema)]
+        yield table, pyarrow.RecordBatch.from_arrays(arrays,
+                                                     schema=table_schema)
+
+
+def _write(cashups, directory, extension, open_writer, batch_size):
+    writers = {}
+    counts = dict.fromkeys(COLUMNS, 0)
+    try:
+        for table, batch in iter_batches(cashups, batch_size):
+            if table not in writers:
+                path = os.path.join(directory, table + extension)
+                writers[table] = open_writer(path, batch.schema)
+            writers[table].write_table(pyarrow.Table.from_batches([batch]))
+            counts[table] += batch.num_rows
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return counts
+
+
+def write_parquet(cashups, directory, batch_size=65536):
+    """
+    Write `cashups` as cashups.parquet, reconciliations.parquet and
+    income_accounts.parquet in `directory`. Tables without any rows are not
+    written.
+    :type cashups: kounta.objects.Cashup[]|dict[]
+    :type directory: str
+    :type batch_size: int
+    :rtype: dict
+    :return: The number of rows written to each table.
+    """
+    _require()
+    return _write(cashups, directory, '.parquet',
+                  pyarrow.parquet.ParquetWriter, batch_size)
+
+
+def write_arrow(cashups, directory, batch_size=65536):
+    """
+    Like write_parquet() but writes Arrow IPC files ending in '.arrow'.
+    :type cashups: kounta.objects.Cashup[]|dict[]
+    :type directory: str
+    :type batch_size: int
+    :rtype: dict
+    :return: The number of rows written to each table.
+    """
+    _require()
+    return _write(cashups, directory, '.arrow', pyarrow.ipc.new_file,
+                  batch_size)
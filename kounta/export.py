@@ -0,0 +1,193 @@
+"""
+Exporting the cashups of a company as flat rows of newline delimited JSON or
+CSV.
+
+Rows are built straight from the dicts returned by the API (BaseObject.obj)
+and written as soon as each cashup has been received, so memory use does not
+grow with the number of sites or cashups exported.
+"""
+
+import csv
+import gzip
+import io
+import json
+
+try:
+    _text = unicode
+except NameError:
+    # Python 3
+    _text = str
+
+CASHUP_FIELDS = ('site_id', 'site_name', 'cashup_id', 'cashup_number',
+                 'register_id', 'processed', 'created_at')
+
+RECONCILIATION_FIELDS = CASHUP_FIELDS + (
+    'payment_method_id', 'payment_method', 'ledger_code', 'recorded',
+    'counted', 'cash_in', 'cash_out')
+
+INCOME_ACCOUNT_FIELDS = CASHUP_FIELDS + ('ledger_code', 'tax_id', 'net', 'tax')
+
+
+def _cashup_row(site, cashup):
+    return {
+        'site_id': site['id'],
+        'site_name': site.get('name'),
+        'cashup_id': cashup['id'],
+        'cashup_number': cashup.get('number'),
+        'register_id': (cashup.get('register') or {}).get('id'),
+        'processed': cashup.get('processed'),
+        'created_at': cashup.get('created_at'),
+    }
+
+
+def _iter_cashups(company, **kwargs):
+    """
+    Yield (site, cashup) dicts for every site of `company`, streaming the
+    cashups of each site. `kwargs` are the cashup filters (see
+    Site.cashups()).
+    """
+    for site in company.sites:
+        for cashup in site.iter_cashups(stream=True, **kwargs):
+            yield site.obj, cashup.obj
+
+
+def iter_reconciliations(company, **kwargs):
+    """
+    Yield a row for each reconciliation of each cashup of `company`.
+    :type company: kounta.objects.Company
+    :rtype: dict[]
+    """
+    for site, cashup in _iter_cashups(company, **kwargs):
+        for reconciliation in cashup.get('reconciliations') or []:
+            method = reconciliation.get('payment_method') or {}
+            takings = reconciliation.get('takings') or {}
+            adjustments = reconciliation.get('adjustments') or {}
+            row = _cashup_row(site, cashup)
+            row.update({
+                'payment_method_id': method.get('id'),
+                'payment_method': method.get('name'),
+                'ledger_code': method.get('ledger_code'),
+                'recorded': takings.get('recorded'),
+                'counted': takings.get('counted'),
+                'cash_in': adjustments.get('cash_in'),
+                'cash_out': adjustments.get('cash_out'),
+            })
+            yield row
+
+
+def iter_income_accounts(company, **kwargs):
+    """
+    Yield a row for each amount of each income account of each cashup of
+    `company`.
+    :type company: kounta.objects.Company
+    :rtype: dict[]
+    """
+    for site, cashup in _iter_cashups(company, **kwargs):
+        for account in cashup.get('income_accounts') or []:
+            for amount in account.get('amounts') or []:
+                row = _cashup_row(site, cashup)
+                row.update({
+                    'ledger_code': account.get('ledger_code'),
+                    'tax_id': amount.get('tax_id'),
+                    'net': amount.get('net'),
+                    'tax': amount.get('tax'),
+                })
+                yield row
+
+
+_kinds = {
+    'reconciliations': (iter_reconciliations, RECONCILIATION_FIELDS),
+    'income_accounts': (iter_income_accounts, INCOME_ACCOUNT_FIELDS),
+}
+
+
+def write_ndjson(rows, f):
+    """
+    Write each row as one line of JSON.
+    :type rows: dict[]
+    :param f: A file opened for writing text.
+    :rtype: int
+    :return: The number of rows written.
+    """
+    count = 0
+    for row in rows:
+        f.write(_text(json.dumps(row, sort_keys=True)))
+        f.write(_text('\n'))
+        count += 1
+    return count
+
+
+def write_csv(rows, f, fields):
+    """
+    Write the rows as CSV with a header line of `fields`.
+    :type rows: dict[]
+    :param f: A file opened for writing text with newline=''.
+    :type fields: str[]
+    :rtype: int
+    :return: The number of rows written.
+    """
+    if _text is not str:
+        # The csv module of Python 2 only writes UTF-8 encoded str.
+        f = _Decoder(f)
+        rows = (_encode(row) for row in rows)
+
+    writer = csv.DictWriter(f, fields)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+class _Decoder:
+    """
+    Decodes the UTF-8 written by the csv module of Python 2 before writing it
+    to a text file.
+    """
+
+    def __init__(self, f):
+        self._f = f
+
+    def write(self, data):
+        return self._f.write(data.decode('utf-8'))
+
+
+def _encode(row):
+    return dict((name, value.encode('utf-8') if isinstance(value, _text)
+                 else value) for name, value in row.items())
+
+
+def _open(path, compress):
+    if compress:
+        return io.TextIOWrapper(gzip.GzipFile(path, 'wb'), encoding='utf-8',
+                                newline='')
+    return io.open(path, 'w', encoding='utf-8', newline='')
+
+
+def export(company, path, format='ndjson', kind='reconciliations',
+           compress=None, **kwargs):
+    """
+    Export the cashups of `company` to the file at `path`.
+    :type company: kounta.objects.Company
+    :type path: str
+    :param format: 'ndjson' or 'csv'.
+    :param kind: 'reconciliations' or 'income_accounts'.
+    :param compress: Write gzip; by default when `path` ends with '.gz'.
+    :param kwargs: Cashup filters, as for Site.cashups().
+    :rtype: int
+    :return: The number of rows written.
+    """
+    if kind not in _kinds:
+        raise ValueError('unknown kind %r' % kind)
+    if format not in ('ndjson', 'csv'):
+        raise ValueError('unknown format %r' % format)
+    if compress is None:
+        compress = path.endswith('.gz')
+
+    iter_rows, fields = _kinds[kind]
+    rows = iter_rows(company, **kwargs)
+    with _open(path, compress) as f:
+        if format == 'csv':
+            return write_csv(rows, f, fields)
+        return write_ndjson(rows, f)
@@ -0,0 +1,111 @@
+from array import array
+
+_missing = float('nan')
+
+
+class StockMatrix:
+    """
+    The stock of every product at every site, held as one flat array of
+    floats (product by site) rather than as an Inventory object per product
+    and site. A product that a site did not report stock for is None.
+    """
+
+    def __init__(self, inventories):
+        """
+        :param inventories: The decoded inventory endpoint of each site, as a
+            dict of site ID to a list of {"id": product_id, "stock": n}.
+        :type inventories: dict
+        """
+        self.site_ids = sorted(inventories)
+        product_ids = set()
+        for items in inventories.values():
+            product_ids.update(item['id'] for item in items)
+        self.product_ids = sorted(product_ids)
+
+        self._products = dict((id, i) for i, id in enumerate(self.product_ids))
+        self._sites = dict((id, i) for i, id in enumerate(self.site_ids))
+
+        width = len(self.site_ids)
+        self._stock = array('d', [_missing]) * (len(self.product_ids) * width)
+        for site_id, items in inventories.items():
+            column = self._sites[site_id]
+            for item in items:
+                stock = item.get('stock')
+                if stock is not None:
+                    row = self._products[item['id']]
+                    self._stock[row * width + column] = stock
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def _value(self, index):
+        value = self._stock[index]
+        if value != value:
+            # NaN marks stock that was not reported.
+            return None
+        if value.is_integer():
+            return int(value)
+        return value
+
+    def stock(self, product_id, site_id):
+        """
+        The stock of a product at a site, or None if it is not known.
+        :type product_id: int
+        :type site_id: int
+        :rtype: int|float|None
+        """
+        try:
+            row = self._products[product_id]
+            column = self._sites[site_id]
+        except KeyError:
+            return None
+        return self._value(row * len(self.site_ids) + column)
+
+    def __getitem__(self, key):
+        """
+        matrix[product_id, site_id] is the same as matrix.stock(product_id,
+        site_id).
+        """
+        return self.stock(*key)
+
+    def product(self, product_id):
+        """
+        The stock of a product at each site that reported it.
+        :type product_id: int
+        :rtype: dict
+        """
+        row = self._products.get(product_id)
+        if row is None:
+            return {}
+        start = row * len(self.site_ids)
+        result = {}
+        for column, site_id in enumerate(self.site_ids):
+            value = self._value(start + column)
+            if value is not None:
+                result[site_id] = value
+        return result
+
+    def site(self, site_id):
+        """
+        The stock of each product reported by a site.
+        :type site_id: int
+        :rtype: dict
+        """
+        column = self._sites.get(site_id)
+        if column is None:
+            return {}
+        width = len(self.site_ids)
+        result = {}
+        for row, product_id in enumerate(self.product_ids):
+            value = self._value(row * width + column)
+            if value is not None:
+                result[product_id] = value
+        return result
+
+    def total(self, product_id):
+        """
+        The stock of a product across all sites.
+        :type product_id: int
+        :rtype: int|float
+        """
+        return sum(self.product(product_id).values())
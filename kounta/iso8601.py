@@ -0,0 +1,57 @@
+"""
+Parsing the timestamps returned by the API.
+
+The API always sends ISO-8601 timestamps like '2013-06-02T14:22:08+10:00'.
+dateutil can parse almost anything but is slow, so these are matched with one
+regular expression and dateutil is only used for anything else.
+"""
+
+from datetime import datetime
+import re
+from dateutil.parser import parse as _dateutil_parse
+from dateutil.tz import tzoffset, tzutc
+
+_pattern = re.compile(r'(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)'
+                      r'(?:\.(\d{1,6})\d*)?(Z|[+-]\d\d:?\d\d)?$')
+
+_utc = tzutc()
+_offsets = {}
+
+
+def _timezone(designator):
+    if designator == 'Z':
+        return _utc
+
+    timezone = _offsets.get(designator)
+    if timezone is None:
+        sign = -1 if designator[0] == '-' else 1
+        seconds = sign * (int(designator[1:3]) * 3600 +
+                          int(designator[-2:]) * 60)
+        # The same offset objects as dateutil uses, so results compare and
+        # print the same either way.
+        timezone = _utc if seconds == 0 else tzoffset(None, seconds)
+        _offsets[designator] = timezone
+    return timezone
+
+
+def parse(value):
+    """
+    Parse a timestamp. Values that are not in the ISO-8601 format used by the
+    API are passed to dateutil.parser.parse().
+    :type value: str
+    :rtype: datetime
+    """
+    match = _pattern.match(value)
+    if match is None:
+        return _dateutil_parse(value)
+
+    (year, month, day, hour, minute, second, fraction,
+     designator) = match.groups()
+    microsecond = int(fraction.ljust(6, '0')) if fraction else 0
+    timezone = _timezone(designator) if designator else None
+    try:
+        return datetime(int(year), int(month), int(day), int(hour),
+                        int(minute), int(second), microsecond, timezone)
+    except ValueError:
+        # Out of range fields, which dateutil will report properly.
+        return _dateutil_parse(value)
@@ -0,0 +1,136 @@
+"""
+Decoding JSON from a response body that arrives in chunks, without first
+joining the chunks into one string.
+
+The standard json module can only decode a complete document, so this module
+walks a top-level array one item at a time with JSONDecoder.raw_decode() and
+only ever buffers the item currently being received. Every list endpoint of the
+API returns an array; any other document is decoded in one go.
+"""
+
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_whitespace = ' \t\n\r'
+_terminators = _whitespace + ',]'
+
+
+def decode(chunks):
+    """
+    Decode a JSON document from an iterable of byte strings.
+    :type chunks: bytes[]
+    :rtype: dict|list
+    """
+    chunks = _text(chunks)
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        start = buffer.lstrip(_whitespace)[:1]
+        if start:
+            break
+    else:
+        raise ValueError('No JSON object could be decoded')
+
+    if start != '[':
+        return json.loads(buffer + ''.join(chunks))
+
+    return list(_iter_array(buffer, chunks))
+
+
+def iter_array(chunks):
+    """
+    Yield the items of a top-level JSON array from an iterable of byte strings
+    as soon as each item has been received.
+    :type chunks: bytes[]
+    :rtype: generator
+    """
+    return _iter_array('', _text(chunks))
+
+
+def _text(chunks):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        if not isinstance(chunk, bytes):
+            yield chunk
+            continue
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', True)
+    if text:
+        yield text
+
+
+def _iter_array(buffer, chunks):
+    chunks = iter(chunks)
+    position = 0
+    # 'open' until the '[' has been read, then 'item' before each value and
+    # 'separator' after one.
+    state = 'open'
+    finished = False
+
+    while True:
+        while position < len(buffer) and buffer[position] in _whitespace:
+            position += 1
+
+        if position < len(buffer):
+            char = buffer[position]
+            if state == 'open':
+                if char != '[':
+                    raise ValueError('Expected a JSON array')
+                position += 1
+                state = 'first'
+                continue
+
+            if state == 'separator':
+                if char == ',':
+                    position += 1
+                    state = 'item'
+                    continue
+                if char == ']':
+                    _expect_end(buffer[position + 1:], chunks)
+                    return
+                raise ValueError('Expected , or ] at character %d' % position)
+
+            if char == ']':
+                if state == 'item':
+                    raise ValueError('Expected a value at character %d' %
+                                     position)
+                _expect_end(buffer[position + 1:], chunks)
+                return
+
+            try:
+                item, end = _decoder.raw_decode(buffer, position)
+            except ValueError:
+                # The item is incomplete, unless there is nothing left to read.
+                if finished:
+                    raise
+                end = None
+
+            # A number that runs to the end of what has been received, like
+            # '-1.' in '-1.5', may continue in the next chunk. So an item is
+            # only accepted once the character that ends it has arrived.
+            if end is not None and (finished or (
+                    end < len(buffer) and buffer[end] in _terminators)):
+                yield item
+                position = end
+                state = 'separator'
+                continue
+
+        if finished:
+            raise ValueError('Unterminated JSON array')
+
+        # Drop what has been consumed and read the next chunk.
+        buffer = buffer[position:]
+        position = 0
+        try:
+            buffer += next(chunks)
+        except StopIteration:
+            finished = True
+
+
+def _expect_end(rest, chunks):
+    for chunk in [rest] + list(chunks):
+        if chunk.strip(_whitespace):
+            raise ValueError('Extra data after JSON array')
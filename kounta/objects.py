@@ -1,6 +1,8 @@
-from dateutil.parser import parse
+from kounta.iso8601 import parse
+from datetime import timedelta
 import os
 import json
+import weakref
 
 """
 We must prevent CashupUrlGenerator from being imported when we only want to
@@ -8,15 +10,61 @@ generated documentation of the classes in this file.
 """
 if not os.environ.get('DOC'):
     from kounta.cashup import CashupUrlGenerator
+    from kounta.order import OrderUrlGenerator
+    from kounta.inventory import StockMatrix
 
 
-class BaseObject:
+class _Stub(dict):
+    """
+    The dict of an entity that has only been seen embedded in other responses
+    and may be missing fields. The first time a missing field is read the
+    entity is hydrated from the company's list endpoint (see
+    BaseObject._hydrate()), which fills in this dict.
+    """
+
+    __slots__ = ('_instance',)
+
+    def __init__(self, obj, instance):
+        dict.__init__(self, obj)
+        # Weak, so that the identity map can still forget the instance.
+        self._instance = weakref.ref(instance)
+
+    def __missing__(self, key):
+        instance = self._instance and self._instance()
+        if instance is not None:
+            # Threads hydrating at once share the fetch of the list (see
+            # BasicClient.get_url()).
+            instance._hydrate()
+            # Only hydrate once, even if the field turns out not to exist. A
+            # hydration that raised is tried again.
+            self._instance = None
+        # Another thread may have hydrated this dict in the meantime.
+        if key in self:
+            return dict.__getitem__(self, key)
+        raise KeyError(key)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+class BaseObject(object):
     """
     Used as the parent for all objects returned from the API. It main purpose is
     to allow documentation to be built into the object instead of using plain
     `dict`s.
+
+    Nested objects and timestamps are built the first time they are read and
+    then kept. Entities embedded in many responses (`_shared`) are wrapped once
+    per client, and those with a `_lookup` are completed from their list
+    endpoint when a property reads a missing field (see _hydrate()).
     """
 
+    __slots__ = ('_obj', '_client', '_company', '_memo', '__weakref__')
+
+    _shared = False
+
+    _lookup = None
+
     def __init__(self, obj, client, company):
         """
         :type company: Company|None
@@ -26,21 +74,55 @@ class BaseObject:
 
         assert isinstance(company, Company) or company is None
 
-        self.obj = obj
+        self._obj = obj
         self._client = client
         self._company = company
+        self._memo = None
 
     def __getattr__(self, item):
         """
         Returns an attribute as it was originally set in the raw object.
         :type item: str
         """
-        return self.obj[item]
+        if item == 'obj' or item in BaseObject.__slots__ or \
+                item.startswith('__'):
+            # An empty slot (for example while unpickling) must not recurse
+            # into self.obj.
+            raise AttributeError(item)
+        obj = self._obj
+        if isinstance(obj, _Stub) and item not in obj:
+            # Only the documented properties hydrate.
+            raise KeyError(item)
+        return obj[item]
+
+    @property
+    def obj(self):
+        """
+        The raw object as it was decoded from the API.
+        :rtype: dict
+        """
+        return self._obj
+
+    @obj.setter
+    def obj(self, obj):
+        self._obj = obj
+        self._memo = None
+
+    @property
+    def _resource_url(self):
+        """
+        The endpoint of this object without the '.json' extension, or None if
+        it does not have one. This is used to invalidate its cached URLs.
+        :rtype: str|None
+        """
+        return None
 
     def __str__(self):
         """
         When converting any API object to a string the original JSON fetched
-        will be returned.
+        will be returned, except that the entities embedded in it (see
+        `_shared`) hold every field known for them, including fields taken
+        from other responses.
 
         It is important to recognise that this JSON may not represent the actual
         state of the object behind it because some calls may make further API
@@ -48,25 +130,191 @@ class BaseObject:
         """
         return json.dumps(self.obj)
 
+    def _memoized(self, key, build, *args):
+        """
+        Return the value memoized under `key`, calling `build` with `args` to
+        create it the first time it is asked for.
+        :type key: str
+        :type build: callable
+        """
+        try:
+            return self._memo[key]
+        except (KeyError, TypeError):
+            # TypeError: nothing has been memoized yet.
+            pass
+
+        value = build(*args)
+        if self._memo is None:
+            self._memo = {}
+        self._memo[key] = value
+        return value
+
+    def _datetime(self, field):
+        """
+        Parse the timestamp in `field`. It is only parsed the first time.
+        :type field: str
+        :rtype: datetime
+        """
+        try:
+            return self._memo[field]
+        except (KeyError, TypeError):
+            return self._memoized(field, parse, self._obj[field])
+
+    def _child(self, field, cls):
+        """
+        Wrap the object nested in `field` in `cls`. It is only wrapped the
+        first time.
+        :type field: str
+        :type cls: type
+        :return: BaseObject
+        """
+        try:
+            return self._memo[field]
+        except (KeyError, TypeError):
+            child = self._wrap(cls, self._obj[field], self._child_company())
+            # Point at the shared dict so that this copy can be freed.
+            self._obj[field] = child._obj
+            return self._memoized(field, lambda: child)
+
+    def _children(self, field, cls):
+        """
+        Wrap each object in the list nested in `field` in `cls`. They are only
+        wrapped the first time.
+        :type field: str
+        :type cls: type
+        :return: BaseObject[]
+        """
+        try:
+            return self._memo[field]
+        except (KeyError, TypeError):
+            children = self._wrap_all(cls, self._obj[field],
+                                      self._child_company())
+            return self._memoized(field, lambda: children)
+
+    def _wrap(self, cls, obj, company, fetched=False):
+        """
+        Wrap `obj` in `cls`, through the client's identity map if `cls` is
+        shared and `obj` has an ID.
+        :type cls: type
+        :type obj: dict
+        :type company: Company|None
+        :param fetched: `obj` was fetched from an endpoint of its own rather
+            than embedded in another response, so its fields are up to date.
+        :return: BaseObject
+        """
+        if cls._shared:
+            return self._client._identify(cls, obj, company, fetched)
+        return cls(obj, self._client, company)
+
+    def _wrap_all(self, cls, items, company, fetched=False):
+        """
+        Wrap each item of `items` (see _wrap()), replacing items in the list
+        with the shared dict of their entity.
+        :return: BaseObject[]
+        """
+        wrapped = [self._wrap(cls, item, company, fetched) for item in items]
+        if cls._shared and isinstance(items, list):
+            for i, obj in enumerate(wrapped):
+                items[i] = obj._obj
+        return wrapped
+
+    def _make_stub(self):
+        """
+        Hydrate this object when a field missing from its dict is read, if it
+        has a `_lookup`.
+        """
+        if self._lookup is not None and self._company is not None:
+            self._obj = _Stub(self._obj, self)
+
+    def _hydrate(self):
+        """
+        Fill in the dict of this object from the company's list endpoint. The
+        list is cached and indexed by the client, so only the first stub of
+        each kind makes a request. Fields without a property, read as plain
+        attributes, never hydrate.
+        """
+        getattr(self._company, self._lookup)(self._obj['id'])
+
+    def _child_company(self):
+        # A company is the company of the objects nested in it.
+        if self._company is None and isinstance(self, Company):
+            return self
+        return self._company
+
     def _make_address(self, field):
         """
         Test if a `field` is not None and return an Address object. Otherwise
         return None
         :type field: str
         """
-        address = self.obj[field]
-        if address:
-            return Address(address, self._client, self._company)
-        return None
+        def build(address):
+            if address:
+                return Address(address, self._client, self._company)
+            return None
+
+        return self._memoized(field, build, self._obj[field])
+
+    def _get_objects(self, url, cls, company):
+        """
+        Fetch a list endpoint and wrap each item in `cls`. The fetch is
+        delegated to the client so that an asynchronous client can return an
+        awaitable instead of the list itself.
+        :type url: str
+        :type cls: type
+        :type company: Company|None
+        :return: BaseObject[]
+        """
+        return self._client._map_url(
+            url, lambda items: self._wrap_all(cls, items, company, True))
+
+    def _get_object(self, url, cls, id):
+        """
+        Find the item with `id` in a list endpoint of the company and wrap it
+        in `cls`, or return None if there is no such item. The lookup uses an
+        index kept by the client (see BasicClient._map_index()), so it makes no
+        request once the list has been cached.
+        :type url: str
+        :type cls: type
+        :type id: int
+        :return: BaseObject|None
+        """
+        company = self._company or self
+
+        def find(index):
+            item = index.get(id)
+            if item is None:
+                return None
+            obj = self._wrap(cls, item, company, True)
+            # Later lookups then find the shared dict and leave its nested
+            # objects and timestamps memoized.
+            index[id] = obj._obj
+            return obj
+
+        return self._client._map_index(url, find)
+
+    def _iter_objects(self, url, cls, company, limit=None, read_ahead=0,
+                      stream=False):
+        """
+        Iterate over a list endpoint one page at a time, wrapping each item in
+        `cls`.
+        :type url: str
+        :type cls: type
+        :type company: Company|None
+        :type limit: int|None
+        :type read_ahead: int
+        :type stream: bool
+        :return: BaseObject[]
+        """
+        items = self._client.iter_url(url, limit=limit, read_ahead=read_ahead,
+                                      stream=stream)
+        return (self._wrap(cls, item, company, True) for item in items)
 
     def _get_addresses(self, url):
         """
         :return: Address[]
         """
         url = '/v1/companies/%d/%s' % (self._company.id, url)
-        addresses = self._client.get_url(url)
-        return [Address(address, self._client, self._company) for address in
-                addresses]
+        return self._get_objects(url, Address, self._company)
 
     def _get_cashups(self, url, **kwargs):
         """
@@ -74,17 +322,34 @@ class BaseObject:
         """
         generator = CashupUrlGenerator()
         url = '%s/%s' % (url, generator.get_url(**kwargs))
-        cashups = self._client.get_url(url)
-        return [Cashup(cashup, self._client, self._company) for cashup
-                in cashups]
+        return self._get_objects(url, Cashup, self._company)
+
+    def _iter_cashups(self, url, limit=None, read_ahead=0, stream=False,
+                      **kwargs):
+        """
+        :return: Cashup[]
+        """
+        generator = CashupUrlGenerator()
+        url = '%s/%s' % (url, generator.get_url(**kwargs))
+        return self._iter_objects(url, Cashup, self._company, limit,
+                                  read_ahead, stream)
+
+    def _iter_orders(self, url, since, until, window, max_workers):
+        """
+        :return: Order[]
+        """
+        urls = ['%s/%s' % (url, order_url) for order_url
+                in OrderUrlGenerator().get_urls(since, until, window)]
+        client = self._client
+        company = self._child_company()
+        return (Order(item, client, company) for item
+                in client.iter_urls(urls, max_workers))
 
     def _get_categories(self, url):
         """
         :return: Category[]
         """
-        categories = self._client.get_url(url)
-        return [Category(category, self._client, self._company) for category in
-                categories]
+        return self._get_objects(url, Category, self._company)
 
 
 class Address(BaseObject):
@@ -93,13 +358,15 @@ class Address(BaseObject):
     customer, company or site.
     """
 
+    __slots__ = ()
+
     @property
     def id(self):
         """
         Address ID.
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
 
     @property
     def city(self):
@@ -107,7 +374,7 @@ class Address(BaseObject):
         City/suburb.
         :return: str
         """
-        return self.obj['city']
+        return self._obj['city']
 
     @property
     def lines(self):
@@ -115,7 +382,7 @@ class Address(BaseObject):
         Address lines.
         :return: str[]
         """
-        return self.obj['lines']
+        return self._obj['lines']
 
     @property
     def zone(self):
@@ -123,7 +390,7 @@ class Address(BaseObject):
         Zone/state.
         :return: str
         """
-        return self.obj['zone']
+        return self._obj['zone']
 
     @property
     def postal_code(self):
@@ -131,7 +398,7 @@ class Address(BaseObject):
         Postal code.
         :return: str
         """
-        return self.obj['postal_code']
+        return self._obj['postal_code']
 
     @property
     def country(self):
@@ -139,7 +406,7 @@ class Address(BaseObject):
         Country.
         :return: str
         """
-        return self.obj['country']
+        return self._obj['country']
 
 
 class Company(BaseObject):
@@ -148,13 +415,21 @@ class Company(BaseObject):
     may have one or more registers running Kounta on one or more sites.
     """
 
+    __slots__ = ()
+
+    _shared = True
+
     @property
     def id(self):
         """
         Company ID.
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
+
+    @property
+    def _resource_url(self):
+        return '/v1/companies/%d' % self.id
 
     @property
     def name(self):
@@ -162,7 +437,7 @@ class Company(BaseObject):
         Company name.
         :return: str
         """
-        return self.obj['name']
+        return self._obj['name']
 
     @property
     def shipping_address(self):
@@ -187,8 +462,7 @@ class Company(BaseObject):
         :return: Address[]
         """
         url = '/v1/companies/%d/addresses.json' % self.id
-        addresses = self._client.get_url(url)
-        return [Address(address, self._client, self) for address in addresses]
+        return self._get_objects(url, Address, self)
 
     @property
     def business_number(self):
@@ -196,7 +470,7 @@ class Company(BaseObject):
         ABN, ACN or whatever is applicable as the business number.
         :return: str
         """
-        return self.obj['business_number']
+        return self._obj['business_number']
 
     @property
     def contact_staff_member(self):
@@ -204,7 +478,7 @@ class Company(BaseObject):
         Contact staff member.
         :return: Staff
         """
-        return Staff(self.obj['contact_staff_member'], self._client, self)
+        return self._child('contact_staff_member', Staff)
 
     @property
     def image(self):
@@ -212,7 +486,7 @@ class Company(BaseObject):
         Avatar image.
         :return: str
         """
-        return self.obj['image']
+        return self._obj['image']
 
     @property
     def website(self):
@@ -220,7 +494,7 @@ class Company(BaseObject):
         Website.
         :return: str
         """
-        return self.obj['website']
+        return self._obj['website']
 
     @property
     def currency(self):
@@ -228,7 +502,7 @@ class Company(BaseObject):
         Currency code.
         :return: str
         """
-        return self.obj['currency']
+        return self._obj['currency']
 
     @property
     def timezone(self):
@@ -236,7 +510,7 @@ class Company(BaseObject):
         Timezone information.
         :return: Timezone
         """
-        return Timezone(self.obj['timezone'], self._client, self)
+        return self._child('timezone', Timezone)
 
     @property
     def sites(self):
@@ -244,8 +518,8 @@ class Company(BaseObject):
         Fetch all sites for this company.
         :return: Site[]
         """
-        sites = self._client.get_url('/v1/companies/%d/sites.json' % self.id)
-        return [Site(site, self._client, self) for site in sites]
+        url = '/v1/companies/%d/sites.json' % self.id
+        return self._get_objects(url, Site, self)
 
     @property
     def registers(self):
@@ -254,9 +528,140 @@ class Company(BaseObject):
         :return: Register[]
         """
         url = '/v1/companies/%d/registers.json' % self.id
-        registers = self._client.get_url(url)
-        return [Register(register, self._client, self._company) for register in
-                registers]
+        return self._get_objects(url, Register, self)
+
+    @property
+    def products(self):
+        """
+        Fetch all products for this company.
+        :return: Product[]
+        """
+        url = '/v1/companies/%d/products.json' % self.id
+        return self._get_objects(url, Product, self)
+
+    @property
+    def payment_methods(self):
+        """
+        Fetch all payment methods for this company.
+        :return: PaymentMethod[]
+        """
+        url = '/v1/companies/%d/payment_methods.json' % self.id
+        return self._get_objects(url, PaymentMethod, self)
+
+    @property
+    def taxes(self):
+        """
+        Fetch all taxes for this company.
+        :return: Tax[]
+        """
+        url = '/v1/companies/%d/taxes.json' % self.id
+        return self._get_objects(url, Tax, self)
+
+    @property
+    def staff(self):
+        """
+        Fetch all staff members for this company.
+        :return: Staff[]
+        """
+        url = '/v1/companies/%d/staff.json' % self.id
+        return self._get_objects(url, Staff, self)
+
+    def stock_levels(self, max_workers=None):
+        """
+        Fetch the inventory of every site, `max_workers` sites at a time, as
+        one product by site matrix of stock levels. This is much smaller than
+        an Inventory object for each product at each site. Like
+        Site.inventory the responses are cached.
+        :type max_workers: int|None
+        :rtype : StockMatrix
+        """
+        client = self._client
+
+        def fetch(sites):
+            site_ids = [site['id'] for site in sites]
+            urls = ['/v1/companies/%d/sites/%d/inventory.json' % (self.id, id)
+                    for id in site_ids]
+            return client._map_urls(
+                urls, lambda inventories: StockMatrix(
+                    dict(zip(site_ids, inventories))), max_workers)
+
+        return client._map_url('/v1/companies/%d/sites.json' % self.id, fetch)
+
+    def site(self, id):
+        """
+        Find a site by its ID, or None. Lookups are answered from an index of
+        the company's sites without a request once they have been fetched.
+        :type id: int
+        :rtype : Site
+        """
+        url = '/v1/companies/%d/sites.json' % self.id
+        return self._get_object(url, Site, id)
+
+    def register(self, id):
+        """
+        Find a register by its ID, or None (see site()).
+        :type id: int
+        :rtype : Register
+        """
+        url = '/v1/companies/%d/registers.json' % self.id
+        return self._get_object(url, Register, id)
+
+    def product(self, id):
+        """
+        Find a product by its ID, or None (see site()).
+        :type id: int
+        :rtype : Product
+        """
+        url = '/v1/companies/%d/products.json' % self.id
+        return self._get_object(url, Product, id)
+
+    def payment_method(self, id):
+        """
+        Find a payment method by its ID, or None (see site()).
+        :type id: int
+        :rtype : PaymentMethod
+        """
+        url = '/v1/companies/%d/payment_methods.json' % self.id
+        return self._get_object(url, PaymentMethod, id)
+
+    def tax(self, id):
+        """
+        Find a tax by its ID, or None (see site()).
+        :type id: int
+        :rtype : Tax
+        """
+        url = '/v1/companies/%d/taxes.json' % self.id
+        return self._get_object(url, Tax, id)
+
+    def staff_member(self, id):
+        """
+        Find a staff member by their ID, or None (see site()).
+        :type id: int
+        :rtype : Staff
+        """
+        url = '/v1/companies/%d/staff.json' % self.id
+        return self._get_object(url, Staff, id)
+
+    def iter_sites(self, limit=None, read_ahead=0):
+        """
+        Iterate over the sites for this company, fetching one page at a time.
+        At most `limit` sites are returned. Up to `read_ahead` further pages
+        are fetched on a background thread while the current one is processed.
+        :rtype : Site[]
+        """
+        url = '/v1/companies/%d/sites.json' % self.id
+        return self._iter_objects(url, Site, self, limit, read_ahead)
+
+    def iter_registers(self, limit=None, read_ahead=0):
+        """
+        Iterate over the registers for this company, fetching one page at a
+        time. At most `limit` registers are returned. Up to `read_ahead`
+        further pages are fetched on a background thread while the current one
+        is processed.
+        :rtype : Register[]
+        """
+        url = '/v1/companies/%d/registers.json' % self.id
+        return self._iter_objects(url, Register, self, limit, read_ahead)
 
     @property
     def created_at(self):
@@ -264,7 +669,7 @@ class Company(BaseObject):
         When the company was created.
         :return: datetime
         """
-        return parse(self.obj['created_at'])
+        return self._datetime('created_at')
 
     @property
     def updated_at(self):
@@ -272,7 +677,7 @@ class Company(BaseObject):
         When the company was last modified.
         :return: datetime
         """
-        return parse(self.obj['updated_at'])
+        return self._datetime('updated_at')
 
     def cashups(self, **kwargs):
         """
@@ -280,7 +685,36 @@ class Company(BaseObject):
         information.
         :rtype : Cashup[]
         """
-        return self._get_cashups('/v1/companies/%d' % self.id, **kwargs)
+        url = '/v1/companies/%d/%s' % (self.id,
+                                       CashupUrlGenerator().get_url(**kwargs))
+        return self._get_objects(url, Cashup, self)
+
+    def iter_cashups(self, limit=None, read_ahead=0, stream=False,
+                     **kwargs):
+        """
+        Iterate over the cashups for a company, fetching one page at a time. At
+        most `limit` cashups are returned. Accepts the same filters as
+        cashups(). Up to `read_ahead` further pages are fetched on a background
+        thread while the current one is processed. With `stream` set each
+        cashup is returned as soon as it has been downloaded.
+        :rtype : Cashup[]
+        """
+        url = '/v1/companies/%d/%s' % (self.id,
+                                       CashupUrlGenerator().get_url(**kwargs))
+        return self._iter_objects(url, Cashup, self, limit, read_ahead,
+                                  stream)
+
+    def orders(self, since, until=None, window=timedelta(days=7),
+               max_workers=None):
+        """
+        Iterate over the orders created for this company from `since` up to
+        `until` (by default, now), oldest window first. The range is split into
+        windows no longer than `window` which are fetched `max_workers` at a
+        time. Orders are not cached.
+        :rtype : Order[]
+        """
+        return self._iter_orders('/v1/companies/%d' % self.id, since, until,
+                                 window, max_workers)
 
     @property
     def categories(self):
@@ -289,30 +723,32 @@ class Company(BaseObject):
         :rtype : Category[]
         """
         url = '/v1/companies/%d/categories.json' % self.id
-        return self._get_categories(url)
+        return self._get_objects(url, Category, self)
 
 
 class Permission(BaseObject):
+    __slots__ = ()
+
     @property
     def code(self):
         """
         :rtype : str
         """
-        return self.obj['code']
+        return self._obj['code']
 
     @property
     def name(self):
         """
         :rtype : str
         """
-        return self.obj['name']
+        return self._obj['name']
 
     @property
     def domain(self):
         """
         :rtype : str
         """
-        return self.obj['domain']
+        return self._obj['domain']
 
 
 class Timezone(BaseObject):
@@ -320,19 +756,21 @@ class Timezone(BaseObject):
     A timezone represents a time offset at a geographical location.
     """
 
+    __slots__ = ()
+
     @property
     def offset(self):
         """
         :rtype : str
         """
-        return self.obj['offset']
+        return self._obj['offset']
 
     @property
     def name(self):
         """
         :rtype : str
         """
-        return self.obj['name']
+        return self._obj['name']
 
 
 class Staff(BaseObject):
@@ -340,68 +778,78 @@ class Staff(BaseObject):
     Staff members are people who work for the authenticated company.
     """
 
+    __slots__ = ()
+
+    _shared = True
+
+    _lookup = 'staff_member'
+
     @property
     def id(self):
         """
         :rtype: int
         """
-        return self.obj['id']
+        return self._obj['id']
+
+    @property
+    def _resource_url(self):
+        return '/v1/companies/%d/staff/%d' % (self._company.id, self.id)
 
     @property
     def first_name(self):
         """
         :rtype: str
         """
-        return self.obj['first_name']
+        return self._obj['first_name']
 
     @property
     def last_name(self):
         """
         :rtype: str
         """
-        return self.obj['last_name']
+        return self._obj['last_name']
 
     @property
     def is_admin(self):
         """
         :rtype: boolean
         """
-        return self.obj['is_admin']
+        return self._obj['is_admin']
 
     @property
     def primary_email_address(self):
         """
         :rtype: str
         """
-        return self.obj['primary_email_address']
+        return self._obj['primary_email_address']
 
     @property
     def email_addresses(self):
         """
         :rtype: str[]
         """
-        return self.obj['email_addresses']
+        return self._obj['email_addresses']
 
     @property
     def phone(self):
         """
         :rtype: str
         """
-        return self.obj['phone']
+        return self._obj['phone']
 
     @property
     def mobile(self):
         """
         :rtype: str
         """
-        return self.obj['mobile']
+        return self._obj['mobile']
 
     @property
     def fax(self):
         """
         :rtype: str
         """
-        return self.obj['fax']
+        return self._obj['fax']
 
     @property
     def shipping_address(self):
@@ -422,29 +870,28 @@ class Staff(BaseObject):
         """
         :return: Permission[]
         """
-        return [Permission(p, self._client, self._company) for p in
-                self.obj['permissions']]
+        return self._children('permissions', Permission)
 
     @property
     def image(self):
         """
         :rtype: str
         """
-        return self.obj['image']
+        return self._obj['image']
 
     @property
     def created_at(self):
         """
         :rtype: str
         """
-        return parse(self.obj['created_at'])
+        return self._datetime('created_at')
 
     @property
     def updated_at(self):
         """
         :rtype: str
         """
-        return parse(self.obj['updated_at'])
+        return self._datetime('updated_at')
 
     @property
     def addresses(self):
@@ -461,40 +908,50 @@ class Site(BaseObject):
     more Kountas will be used.
     """
 
+    __slots__ = ()
+
+    _shared = True
+
+    _lookup = 'site'
+
     @property
     def id(self):
         """
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
+
+    @property
+    def _resource_url(self):
+        return '/v1/companies/%d/sites/%d' % (self._company.id, self.id)
 
     @property
     def name(self):
         """
         :return: str
         """
-        return self.obj['name']
+        return self._obj['name']
 
     @property
     def code(self):
         """
         :return: str
         """
-        return self.obj['code']
+        return self._obj['code']
 
     @property
     def contact_person(self):
         """
         :return: Staff
         """
-        return Staff(self.obj['contact_person'], self._client, self._company)
+        return self._child('contact_person', Staff)
 
     @property
     def business_number(self):
         """
         :return: str
         """
-        return self.obj['business_number']
+        return self._obj['business_number']
 
     @property
     def shipping_address(self):
@@ -515,77 +972,77 @@ class Site(BaseObject):
         """
         :return: str
         """
-        return self.obj['email']
+        return self._obj['email']
 
     @property
     def mobile(self):
         """
         :return: str
         """
-        return self.obj['mobile']
+        return self._obj['mobile']
 
     @property
     def phone(self):
         """
         :return: str
         """
-        return self.obj['phone']
+        return self._obj['phone']
 
     @property
     def fax(self):
         """
         :return: str
         """
-        return self.obj['fax']
+        return self._obj['fax']
 
     @property
     def location(self):
         """
         :return: Location
         """
-        return Location(self.obj['location'], self._client, self._company)
+        return self._child('location', Location)
 
     @property
     def image(self):
         """
         :return: str
         """
-        return self.obj['image']
+        return self._obj['image']
 
     @property
     def website(self):
         """
         :return: str
         """
-        return self.obj['website']
+        return self._obj['website']
 
     @property
     def register_level_reconciliation(self):
         """
         :return: boolean
         """
-        return self.obj['register_level_reconciliation']
+        return self._obj['register_level_reconciliation']
 
     @property
     def price_list(self):
         """
         :return: PriceList
         """
-        return PriceList(self.obj['price_list'], self._client, self._company)
+        return self._child('price_list', PriceList)
 
     @property
     def created_at(self):
         """
         :return: datetime
         """
-        return parse(self.obj['created_at'])
+        return self._datetime('created_at')
 
     @property
     def updated_at(self):
         """
         :return: datetime
         """
-        return parse(self.obj['updated_at'])
+        return self._datetime('updated_at')
 
     @property
     def addresses(self):
@@ -604,6 +1061,31 @@ class Site(BaseObject):
         url = '/v1/companies/%d/sites/%d' % (self._company.id, self.id)
         return self._get_cashups(url, **kwargs)
 
+    def iter_cashups(self, limit=None, read_ahead=0, stream=False,
+                     **kwargs):
+        """
+        Iterate over the cashups for a site, fetching one page at a time. At
+        most `limit` cashups are returned. Accepts the same filters as
+        cashups(). Up to `read_ahead` further pages are fetched on a background
+        thread while the current one is processed. With `stream` set each
+        cashup is returned as soon as it has been downloaded.
+        :rtype : Cashup[]
+        """
+        url = '/v1/companies/%d/sites/%d' % (self._company.id, self.id)
+        return self._iter_cashups(url, limit, read_ahead, stream, **kwargs)
+
+    def orders(self, since, until=None, window=timedelta(days=7),
+               max_workers=None):
+        """
+        Iterate over the orders created at this site from `since` up to
+        `until` (by default, now), oldest window first. The range is split into
+        windows no longer than `window` which are fetched `max_workers` at a
+        time. Orders are not cached.
+        :rtype : Order[]
+        """
+        url = '/v1/companies/%d/sites/%d' % (self._company.id, self.id)
+        return self._iter_orders(url, since, until, window, max_workers)
+
     @property
     def categories(self):
         """
@@ -620,10 +1102,34 @@ class Site(BaseObject):
         All checkins for this site.
         :rtype : Checkin[]
         """
-        url = '/v1/companies/%d/sites/%d/checkins.json' % (self._company.id, self.id)
-        checkins = self._client.get_url(url)
-        return [Checkin(checkin, self._client, self._company) for checkin in
-                checkins]
+        url = '/v1/companies/%d/sites/%d/checkins.json' % (self._company.id,
+                                                           self.id)
+        return self._get_objects(url, Checkin, self._company)
+
+    @property
+    def inventory(self):
+        """
+        Fetch the stock of each product at this site. Company.stock_levels()
+        does this for every site at once.
+        :return: Inventory[]
+        """
+        url = '/v1/companies/%d/sites/%d/inventory.json' % (self._company.id,
+                                                            self.id)
+        return self._get_objects(url, Inventory, self._company)
+
+    def iter_checkins(self, limit=None, read_ahead=0, stream=False):
+        """
+        Iterate over the checkins for this site, fetching one page at a time.
+        At most `limit` checkins are returned. Up to `read_ahead` further pages
+        are fetched on a background thread while the current one is processed.
+        With `stream` set each checkin is returned as soon as it has been
+        downloaded.
+        :rtype : Checkin[]
+        """
+        url = '/v1/companies/%d/sites/%d/checkins.json' % (self._company.id,
+                                                           self.id)
+        return self._iter_objects(url, Checkin, self._company, limit,
+                                  read_ahead, stream)
 
 
 class Category(BaseObject):
@@ -631,33 +1137,37 @@ class Category(BaseObject):
     Each product will belong to one or more categories.
     """
 
+    __slots__ = ()
+
+    _shared = True
+
     @property
     def id(self):
         """
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
 
     @property
     def name(self):
         """
         :return: int
         """
-        return self.obj['name']
+        return self._obj['name']
 
     @property
     def description(self):
         """
         :return: str
         """
-        return self.obj['description']
+        return self._obj['description']
 
     @property
     def image(self):
         """
         :return: str
         """
-        return self.obj['image']
+        return self._obj['image']
 
 
 class Product(BaseObject):
@@ -665,40 +1175,50 @@ class Product(BaseObject):
     Products are saleable items in your inventory, including modifier products.
     """
 
+    __slots__ = ()
+
+    _shared = True
+
+    _lookup = 'product'
+
     @property
     def id(self):
         """
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
+
+    @property
+    def _resource_url(self):
+        return '/v1/companies/%d/products/%d' % (self._company.id, self.id)
 
     @property
     def name(self):
         """
         :return: int
         """
-        return self.obj['name']
+        return self._obj['name']
 
     @property
     def description(self):
         """
         :return: str
         """
-        return self.obj['description']
+        return self._obj['description']
 
     @property
     def code(self):
         """
         :return: str
         """
-        return self.obj['code']
+        return self._obj['code']
 
     @property
     def barcode(self):
         """
         :return: str
         """
-        return self.obj['barcode']
+        return self._obj['barcode']
 
     @property
     def categories(self):
@@ -716,26 +1236,28 @@ class Checkin(BaseObject):
     Authenticated customers can use checkin service.
     """
 
+    __slots__ = ()
+
     @property
     def customer_id(self):
         """
         :return: int
         """
-        return self.obj['customer_id']
+        return self._obj['customer_id']
 
     @property
     def start_time(self):
         """
         :return: datetime
         """
-        return parse(self.obj['start_time'])
+        return self._datetime('start_time')
 
     @property
     def duration(self):
         """
         :return: int
         """
-        return self.obj['duration']
+        return self._obj['duration']
 
 
 class Customer(BaseObject):
@@ -743,47 +1265,56 @@ class Customer(BaseObject):
     Customers are people who buy from the authenticated company.
     """
 
+    __slots__ = ()
+
+    _shared = True
+
     @property
     def id(self):
         """
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
+
+    @property
+    def _resource_url(self):
+        return '/v1/companies/%d/customer/%d' % (self._company.id,
+                                               self.id)
 
     @property
     def first_name(self):
         """
         :return: str
         """
-        return self.obj['first_name']
+        return self._obj['first_name']
 
     @property
     def last_name(self):
         """
         :return: str
         """
-        return self.obj['last_name']
+        return self._obj['last_name']
 
     @property
     def primary_email_address(self):
         """
         :return: str
         """
-        return self.obj['primary_email_address']
+        return self._obj['primary_email_address']
 
     @property
     def image(self):
         """
         :return: str
         """
-        return self.obj['image']
+        return self._obj['image']
 
     @property
     def reference_id(self):
         """
         :return: str
         """
-        return self.obj['reference_id']
+        return self._obj['reference_id']
 
     @property
     def addresses(self):
@@ -799,19 +1330,21 @@ class Inventory(BaseObject):
     Inventory indicates the quantity for a given product.
     """
 
+    __slots__ = ()
+
     @property
     def id(self):
         """
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
 
     @property
     def stock(self):
         """
         :return: int
         """
-        return self.obj['stock']
+        return self._obj['stock']
 
 
 class Line(BaseObject):
@@ -820,55 +1353,57 @@ class Line(BaseObject):
     products included in an order.
     """
 
+    __slots__ = ()
+
     @property
     def number(self):
         """
         The line number. This will start with `1`.
         :return: int
         """
-        return self.obj['number']
+        return self._obj['number']
 
     @property
     def product_id(self):
         """
         :return: int
         """
-        return self.obj['product_id']
+        return self._obj['product_id']
 
     @property
     def quantity(self):
         """
         :return: int
         """
-        return self.obj['quantity']
+        return self._obj['quantity']
 
     @property
     def notes(self):
         """
         :return: str
         """
-        return self.obj['notes']
+        return self._obj['notes']
 
     @property
     def unit_price(self):
         """
         :return: float
         """
-        return self.obj['unit_price']
+        return self._obj['unit_price']
 
     @property
     def price_variation(self):
         """
         :return: float
         """
-        return self.obj['price_variation']
+        return self._obj['price_variation']
 
     @property
     def modifiers(self):
         """
         :return: int[]
         """
-        return self.obj['modifiers']
+        return self._obj['modifiers']
 
 
 class Order(BaseObject):
@@ -876,54 +1411,70 @@ class Order(BaseObject):
     Orders are also sometimes called sales or invoices.
     """
 
+    __slots__ = ()
+
     @property
     def id(self):
         """
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
 
     @property
     def status(self):
         """
         :return: str
         """
-        return self.obj['status']
+        return self._obj['status']
 
     @property
     def total(self):
         """
         :return: float
         """
-        return self.obj['total']
+        return self._obj['total']
 
     @property
     def total_tax(self):
         """
         :return: float
         """
-        return self.obj['total_tax']
+        return self._obj['total_tax']
 
     @property
     def paid(self):
         """
         :return: float
         """
-        return self.obj['paid']
+        return self._obj['paid']
 
     @property
     def created_at(self):
         """
         :return: datetime
         """
-        return parse(self.obj['created_at'])
+        return self._datetime('created_at')
 
     @property
     def updated_at(self):
         """
         :return: datetime
         """
-        return parse(self.obj['updated_at'])
+        return self._datetime('updated_at')
+
+    @property
+    def lines(self):
+        """
+        :return: Line[]
+        """
+        return self._children('lines', Line)
+
+    @property
+    def payments(self):
+        """
+        :return: Payment[]
+        """
+        return self._children('payments', Payment)
 
 
 class PaymentMethod(BaseObject):
@@ -931,26 +1482,32 @@ class PaymentMethod(BaseObject):
     Payment methods are assigned to order payments.
     """
 
+    __slots__ = ()
+
+    _shared = True
+
+    _lookup = 'payment_method'
+
     @property
     def id(self):
         """
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
 
     @property
     def name(self):
         """
         :return: str
         """
-        return self.obj['name']
+        return self._obj['name']
 
     @property
     def ledger_code(self):
         """
         :return: str
         """
-        return self.obj['ledger_code']
+        return self._obj['ledger_code']
 
 
 class Payment(BaseObject):
@@ -959,26 +1516,28 @@ class Payment(BaseObject):
     order.
     """
 
+    __slots__ = ()
+
     @property
     def method_id(self):
         """
         :return: int
         """
-        return self.obj['method_id']
+        return self._obj['method_id']
 
     @property
     def amount(self):
         """
         :return: float
         """
-        return self.obj['amount']
+        return self._obj['amount']
 
     @property
     def ref(self):
         """
         :return: str
         """
-        return self.obj['ref']
+        return self._obj['ref']
 
 
 class PriceList(BaseObject):
@@ -991,26 +1550,30 @@ class PriceList(BaseObject):
     parent_id of null.
     """
 
+    __slots__ = ()
+
+    _shared = True
+
     @property
     def id(self):
         """
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
 
     @property
     def name(self):
         """
         :return: str
         """
-        return self.obj['name']
+        return self._obj['name']
 
     @property
     def parent_id(self):
         """
         :return: int
         """
-        return self.obj['parent_id']
+        return self._obj['parent_id']
 
 
 class Register(BaseObject):
@@ -1018,33 +1581,44 @@ class Register(BaseObject):
     Registers are iPads or other computers running Kounta.
     """
 
+    __slots__ = ()
+
+    _shared = True
+
+    _lookup = 'register'
+
     @property
     def id(self):
         """
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
+
+    @property
+    def _resource_url(self):
+        return '/v1/companies/%d/registers/%d' % (self._company.id,
+                                                self.id)
 
     @property
     def code(self):
         """
         :return: str
         """
-        return self.obj['code']
+        return self._obj['code']
 
     @property
     def name(self):
         """
         :return: str
         """
-        return self.obj['name']
+        return self._obj['name']
 
     @property
     def site_id(self):
         """
         :return: int
         """
-        return self.obj['site_id']
+        return self._obj['site_id']
 
     def cashups(self, **kwargs):
         """
@@ -1055,25 +1629,40 @@ class Register(BaseObject):
         url = '/v1/companies/%d/registers/%d' % (self._company.id, self.id)
         return self._get_cashups(url, **kwargs)
 
+    def iter_cashups(self, limit=None, read_ahead=0, stream=False,
+                     **kwargs):
+        """
+        Iterate over the cashups for a register, fetching one page at a time.
+        At most `limit` cashups are returned. Accepts the same filters as
+        cashups(). Up to `read_ahead` further pages are fetched on a background
+        thread while the current one is processed. With `stream` set each
+        cashup is returned as soon as it has been downloaded.
+        :rtype : Cashup[]
+        """
+        url = '/v1/companies/%d/registers/%d' % (self._company.id, self.id)
+        return self._iter_cashups(url, limit, read_ahead, stream, **kwargs)
+
 
 class ShiftPeriod(BaseObject):
     """
     Represents a block of time when dealing with `Shift`s.
     """
 
+    __slots__ = ()
+
     @property
     def started_at(self):
         """
         :return: datetime
         """
-        return parse(self.obj['started_at'])
+        return self._datetime('started_at')
 
     @property
     def finished_at(self):
         """
         :return: datetime
         """
-        return parse(self.obj['finished_at'])
+        return self._datetime('finished_at')
 
     @property
     def period(self):
@@ -1089,27 +1678,28 @@ class Shift(ShiftPeriod):
     Shifts record staff check-ins, check-outs and breaks.
     """
 
+    __slots__ = ()
+
     @property
     def staff_member(self):
         """
         :return: Staff
         """
-        return Staff(self.obj['staff_member'], self._client, self._company)
+        return self._child('staff_member', Staff)
 
     @property
     def site(self):
         """
         :return: Site
         """
-        return Site(self.obj['site'], self._client, self._company)
+        return self._child('site', Site)
 
     @property
     def breaks(self):
         """
         :return: Shift[]
         """
-        return [Shift(shift, self._client, self._company) for shift in
-                self.obj['breaks']]
+        return self._children('breaks', Shift)
 
 
 class Location(BaseObject):
@@ -1117,19 +1707,21 @@ class Location(BaseObject):
     A geographical location with a latitude and longitude.
     """
 
+    __slots__ = ()
+
     @property
     def latitude(self):
         """
         :return: float
         """
-        return self.obj['latitude']
+        return self._obj['latitude']
 
     @property
     def longitude(self):
         """
         :return: float
         """
-        return self.obj['longitude']
+        return self._obj['longitude']
 
 
 class Tax(BaseObject):
@@ -1138,33 +1730,39 @@ class Tax(BaseObject):
     rate.
     """
 
+    __slots__ = ()
+
+    _shared = True
+
+    _lookup = 'tax'
+
     @property
     def id(self):
         """
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
 
     @property
     def code(self):
         """
         :return: str
         """
-        return self.obj['code']
+        return self._obj['code']
 
     @property
     def name(self):
         """
         :return: str
         """
-        return self.obj['name']
+        return self._obj['name']
 
     @property
     def rate(self):
         """
         :return: float
         """
-        return self.obj['rate']
+        return self._obj['rate']
 
 
 class IncomeAccountAmount(BaseObject):
@@ -1172,26 +1770,28 @@ class IncomeAccountAmount(BaseObject):
     An amount for a given tax type.
     """
 
+    __slots__ = ()
+
     @property
     def tax_id(self):
         """
         :return: int
         """
-        return self.obj['tax_id']
+        return self._obj['tax_id']
 
     @property
     def net(self):
         """
         :return: float
         """
-        return self.obj['net']
+        return self._obj['net']
 
     @property
     def tax(self):
         """
         :return: float
         """
-        return self.obj['tax']
+        return self._obj['tax']
 
 
 class Takings(BaseObject):
@@ -1199,19 +1799,21 @@ class Takings(BaseObject):
     Daily takings.
     """
 
+    __slots__ = ()
+
     @property
     def recorded(self):
         """
         :return: float
         """
-        return self.obj['recorded']
+        return self._obj['recorded']
 
     @property
     def counted(self):
         """
         :return: float
         """
-        return self.obj['counted']
+        return self._obj['counted']
 
 
 class Adjustments(BaseObject):
@@ -1219,19 +1821,21 @@ class Adjustments(BaseObject):
     Adjustments to a reconciliation.
     """
 
+    __slots__ = ()
+
     @property
     def cash_in(self):
         """
         :return: float
         """
-        return self.obj['cash_in']
+        return self._obj['cash_in']
 
     @property
     def cash_out(self):
         """
         :return: float
         """
-        return self.obj['cash_out']
+        return self._obj['cash_out']
 
 
 class IncomeAccount(BaseObject):
@@ -1239,20 +1843,21 @@ class IncomeAccount(BaseObject):
     Income account.
     """
 
+    __slots__ = ()
+
     @property
     def ledger_code(self):
         """
         :return: string
         """
-        return self.obj['ledger_code']
+        return self._obj['ledger_code']
 
     @property
     def amounts(self):
         """
         :return: IncomeAccountAmount[]
         """
-        return [IncomeAccountAmount(amount, self._client, self._company)
-                for amount in self.obj['amounts']]
+        return self._children('amounts', IncomeAccountAmount)
 
 
 class Reconciliation(BaseObject):
@@ -1260,27 +1865,28 @@ class Reconciliation(BaseObject):
     End-of-day reconciliation.
     """
 
+    __slots__ = ()
+
     @property
     def payment_method(self):
         """
         :return: PaymentMethod
         """
-        return PaymentMethod(self.obj['payment_method'], self._client,
-                             self._company)
+        return self._child('payment_method', PaymentMethod)
 
     @property
     def takings(self):
         """
         :return: Takings
         """
-        return Takings(self.obj['takings'], self._client, self._company)
+        return self._child('takings', Takings)
 
     @property
     def adjustments(self):
         """
         :return: Adjustments
         """
-        return Adjustments(self.obj['adjustments'], self._client, self._company)
+        return self._child('adjustments', Adjustments)
 
 
 class Cashup(BaseObject):
@@ -1288,74 +1894,74 @@ class Cashup(BaseObject):
     Cash-ups are end-of-day cash reconcilliations.
     """
 
+    __slots__ = ()
+
     @property
     def id(self):
         """
         :return: int
         """
-        return self.obj['id']
+        return self._obj['id']
 
     @property
     def number(self):
         """
         :return: int
         """
-        return self.obj['number']
+        return self._obj['number']
 
     @property
     def processed(self):
         """
         :return: boolean
         """
-        return self.obj['processed']
+        return self._obj['processed']
 
     @property
     def register_level_reconciliation(self):
         """
         :return: boolean
         """
-        return self.obj['register_level_reconciliation']
+        return self._obj['register_level_reconciliation']
 
     @property
     def register(self):
         """
         :return: Register
         """
-        return Register(self.obj['register'], self._client, self._company)
+        return self._child('register', Register)
 
     @property
     def site(self):
         """
         :return: Site
         """
-        return Site(self.obj['site'], self._client, self._company)
+        return self._child('site', Site)
 
     @property
     def staff_member(self):
         """
         :return: Staff
         """
-        return Staff(self.obj['staff_member'], self._client, self._company)
+        return self._child('staff_member', Staff)
 
     @property
     def income_accounts(self):
         """
         :return: IncomeAccount[]
         """
-        return [IncomeAccount(account, self._client, self._company) for account
-                in self.obj['income_accounts']]
+        return self._children('income_accounts', IncomeAccount)
 
     @property
     def reconciliations(self):
         """
         :return: Reconciliation[]
         """
-        return [Reconciliation(account, self._client, self._company) for account
-                in self.obj['reconciliations']]
+        return self._children('reconciliations', Reconciliation)
 
     @property
     def created_at(self):
         """
         :return: datetime
         """
-        return parse(self.obj['created_at'])
+        return self._datetime('created_at')
@@ -0,0 +1,68 @@
+from dateutil.parser import parse
+from datetime import date, datetime, timedelta
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+
+class OrderUrlGenerator:
+    def _datetime(self, value):
+        if isinstance(value, datetime):
+            return value
+
+        if isinstance(value, date):
+            return datetime(value.year, value.month, value.day)
+
+        if not isinstance(value, str):
+            raise ValueError('must be a date, datetime or string representing '
+                             'a date')
+
+        return parse(value)
+
+    def get_url(self, since=None, until=None):
+        """
+        Orders created at or after `since` and before `until`.
+        :rtype: str
+        """
+        query = []
+        if since is not None:
+            query.append(('created_gte', self._datetime(since).isoformat()))
+        if until is not None:
+            query.append(('created_lt', self._datetime(until).isoformat()))
+
+        if not query:
+            return 'orders.json'
+        return 'orders.json?' + urlencode(query)
+
+    def get_urls(self, since, until=None, window=timedelta(days=7)):
+        """
+        Split the range from `since` to `until` (by default, now) into
+        consecutive windows no longer than `window` and return the URL of each
+        in chronological order. When only one of `since` and `until` has a
+        timezone the other is taken to be in the same one.
+        :type window: timedelta
+        :rtype: str[]
+        """
+        if window <= timedelta(0):
+            raise ValueError('window must be positive')
+
+        start = self._datetime(since)
+        if until is None:
+            end = datetime.now(start.tzinfo)
+        else:
+            end = self._datetime(until)
+
+        # Naive and aware datetimes cannot be compared.
+        if start.tzinfo is None and end.tzinfo is not None:
+            start = start.replace(tzinfo=end.tzinfo)
+        elif end.tzinfo is None and start.tzinfo is not None:
+            end = end.replace(tzinfo=start.tzinfo)
+
+        urls = []
+        while start < end:
+            stop = min(start + window, end)
+            urls.append(self.get_url(since=start, until=stop))
+            start = stop
+        return urls
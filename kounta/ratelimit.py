@@ -0,0 +1,168 @@
+import random
+import threading
+import time
+from email.utils import parsedate_tz, mktime_tz
+
+
+class TokenBucket:
+    """
+    A token bucket that limits requests to `rate` per second on average while
+    allowing bursts of up to `capacity` requests. acquire() blocks until a
+    token is available.
+
+    The bucket can also be paused, for example when the server answers 429 Too
+    Many Requests, so that every thread using it waits instead of only the one
+    that was throttled.
+    """
+
+    def __init__(self, rate=None, capacity=None):
+        """
+        :param rate: Requests per second, or None for no limit.
+        :param capacity: The largest burst; defaults to `rate` (at least 1).
+        """
+        if capacity is None:
+            capacity = _default_capacity(rate)
+
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._updated = time.time()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, waiting for one if necessary.
+        :rtype: float
+        :return: The number of seconds spent waiting.
+        """
+        waited = 0
+        while True:
+            with self._lock:
+                now = time.time()
+                delay = self._paused_until - now
+                if delay <= 0 and self.rate is None:
+                    return waited
+
+                if delay <= 0:
+                    elapsed = max(0.0, now - self._updated)
+                    self.tokens = min(self.capacity,
+                                      self.tokens + elapsed * self.rate)
+                    self._updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    delay = (1.0 - self.tokens) / self.rate
+
+            # A delay too small to move the clock would never refill a token.
+            delay = max(delay, _min_delay)
+            time.sleep(delay)
+            waited += delay
+
+    def limit(self, rate, capacity=None):
+        """
+        Change the rate and largest burst of the bucket.
+        :param rate: Requests per second, or None for no limit.
+        :param capacity: The largest burst; defaults to `rate` (at least 1).
+        """
+        if capacity is None:
+            capacity = _default_capacity(rate)
+
+        with self._lock:
+            self.rate = rate
+            self.capacity = capacity
+            self.tokens = min(self.tokens, float(capacity))
+
+    def pause(self, seconds):
+        """
+        Stop handing out tokens for `seconds`. A shorter pause never cuts an
+        existing one short.
+        :type seconds: float
+        """
+        with self._lock:
+            until = time.time() + seconds
+            if until > self._paused_until:
+                self._paused_until = until
+            # Nothing was available during the pause.
+            self.tokens = 0
+            self._updated = until
+
+
+_min_delay = 0.001
+
+
+def _default_capacity(rate):
+    return max(1, rate or 1)
+
+
+_buckets = {}
+_limited = set()
+_buckets_lock = threading.Lock()
+
+
+def shared_bucket(key, rate=None, capacity=None):
+    """
+    Return the bucket for `key` (usually the client ID), creating it the first
+    time it is asked for. Every client using the same credential shares a
+    bucket because the API applies its limits per credential.
+
+    Leaving both `rate` and `capacity` as None joins the existing bucket with
+    whatever limits it has. The first caller to ask for limits sets them for
+    every client sharing the bucket; asking for different limits after that
+    raises ValueError rather than silently using the first ones.
+    :type key: str
+    :rtype: TokenBucket
+    """
+    explicit = rate is not None or capacity is not None
+    if capacity is None:
+        capacity = _default_capacity(rate)
+
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, capacity)
+            _buckets[key] = bucket
+        elif not explicit:
+            return bucket
+        elif key not in _limited:
+            bucket.limit(rate, capacity)
+        elif bucket.rate != rate or bucket.capacity != capacity:
+            raise ValueError(
+                'the bucket for %r allows %s requests per second with bursts '
+                'of %s, not %s and %s; pass a TokenBucket as `bucket` to '
+                'limit this client separately' %
+                (key, bucket.rate, bucket.capacity, rate, capacity))
+        if explicit:
+            _limited.add(key)
+        return bucket
+
+
+def retry_after(value):
+    """
+    Parse a Retry-After header, which is either a number of seconds or an HTTP
+    date.
+    :type value: str|None
+    :rtype: float|None
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, mktime_tz(parsed) - time.time())
+
+
+def backoff(attempt, base=0.5, maximum=60):
+    """
+    Exponential backoff with full jitter: a random delay between zero and
+    base * 2 ** attempt, capped at `maximum` seconds.
+    :type attempt: int
+    :rtype: float
+    """
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
@@ -0,0 +1,240 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+
+
+class SQLiteURLCache:
+    """
+    A URL cache that is stored in an SQLite database so that it survives
+    restarts and can be shared by several processes (and threads) at once:
+
+        cache = SQLiteURLCache('/var/cache/kounta.sqlite', ttl=3600)
+        kounta = BasicClient('client_id', 'client_secret', cache=cache)
+
+    It has the same interface as kounta.client.URLCache. Responses are stored
+    as zlib compressed JSON. Entries older than `ttl` seconds are treated as
+    missing, but are kept for revalidation if they carry an ETag or
+    Last-Modified validator; purge() removes them from the file.
+    """
+
+    def __init__(self, path, ttl=None, timeout=30):
+        """
+        :param path: The database file. It is created if it does not exist.
+        :param ttl: Seconds an entry stays valid for, or None for forever.
+        :param timeout: Seconds to wait for another process to release a lock.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.revalidations = 0
+        self._local = threading.local()
+
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS responses ('
+                           'url TEXT PRIMARY KEY, '
+                           'value BLOB NOT NULL, '
+                           'size INTEGER NOT NULL, '
+                           'expires REAL, '
+                           'etag TEXT, '
+                           'last_modified TEXT, '
+                           'version TEXT NOT NULL)')
+
+    def _connection(self):
+        """
+        SQLite connections cannot be shared between threads so each thread
+        gets its own.
+        :rtype: sqlite3.Connection
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout,
+                                         isolation_level=None)
+            self._local.connection = connection
+        return connection
+
+    def __getitem__(self, item):
+        row = self._connection().execute(
+            'SELECT value, expires FROM responses WHERE url = ?',
+            (item,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        value, expires = row
+        if expires is not None and expires <= time.time():
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(zlib.decompress(value).decode('utf-8'))
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def peek(self, key):
+        """
+        Return the value for `key` if it is fresh, or None, without counting a
+        hit or miss.
+        :type key: str
+        """
+        row = self._connection().execute(
+            'SELECT value, expires FROM responses WHERE url = ?',
+            (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def __delitem__(self, key):
+        self._connection().execute('DELETE FROM responses WHERE url = ?',
+                                   (key,))
+
+    def __contains__(self, key):
+        return self._connection().execute(
+            'SELECT 1 FROM responses WHERE url = ?', (key,)).fetchone() \
+            is not None
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def set(self, key, value, size=None, etag=None, last_modified=None):
+        """
+        Store a value. `size` is the number of bytes the response took up; if
+        it is not known it is taken from the JSON encoded value.
+        :type key: str
+        :type size: int|None
+        :param etag: The ETag header of the response.
+        :param last_modified: The Last-Modified header of the response.
+        """
+        encoded = json.dumps(value).encode('utf-8')
+        if size is None:
+            size = len(encoded)
+
+        expires = None
+        if self.ttl is not None:
+            expires = time.time() + self.ttl
+
+        self._connection().execute(
+            'INSERT OR REPLACE INTO responses '
+            '(url, value, size, expires, etag, last_modified, version) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (key, sqlite3.Binary(zlib.compress(encoded)), size, expires, etag,
+             last_modified, uuid.uuid4().hex))
+
+    def stale(self, key):
+        """
+        Return an entry that has expired but can be revalidated as a tuple of
+        (value, etag, last_modified), or None.
+        :type key: str
+        :rtype: tuple|None
+        """
+        row = self._connection().execute(
+            'SELECT value, etag, last_modified FROM responses WHERE url = ? '
+            'AND (etag IS NOT NULL OR last_modified IS NOT NULL)',
+            (key,)).fetchone()
+        if row is None:
+            return None
+        return (json.loads(zlib.decompress(row[0]).decode('utf-8')), row[1],
+                row[2])
+
+    def version(self, key):
+        """
+        A token that is stored with each response and stays the same until the
+        URL is stored again (by any process), or None if there is no fresh
+        entry. See kounta.client.URLCache.version().
+        :type key: str
+        :rtype: str|None
+        """
+        row = self._connection().execute(
+            'SELECT version, expires FROM responses WHERE url = ?',
+            (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    def touch(self, key):
+        """
+        Mark an entry as fresh again after the server confirmed that it has not
+        been modified.
+        :type key: str
+        """
+        if self.ttl is None:
+            cursor = self._connection().execute(
+                'UPDATE responses SET expires = expires WHERE url = ?', (key,))
+        else:
+            cursor = self._connection().execute(
+                'UPDATE responses SET expires = ? WHERE url = ?',
+                (time.time() + self.ttl, key))
+        # The entry may have been removed while it was being revalidated.
+        if cursor.rowcount:
+            self.revalidations += 1
+
+    def invalidate_prefix(self, prefix):
+        """
+        Drop every entry whose URL starts with `prefix`. This is a range scan
+        on the primary key, so the cost is proportional to the number of
+        entries removed.
+        :type prefix: str
+        :rtype: int
+        :return: The number of entries removed.
+        """
+        if not prefix:
+            count = len(self)
+            self.clear()
+            return count
+
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return self._connection().execute(
+            'DELETE FROM responses WHERE url >= ? AND url < ?',
+            (prefix, upper)).rowcount
+
+    def purge(self):
+        """
+        Remove expired entries from the database.
+        :rtype: int
+        :return: The number of entries removed.
+        """
+        return self._connection().execute(
+            'DELETE FROM responses WHERE expires <= ?',
+            (time.time(),)).rowcount
+
+    def clear(self):
+        """
+        Drop every entry. The statistics are kept.
+        """
+        self._connection().execute('DELETE FROM responses')
+
+    def stats(self):
+        """
+        The entries and bytes are for the whole database; the other counters
+        are for this instance only. Unlike URLCache there are no evictions,
+        since the database is not bounded.
+        :rtype: dict
+        """
+        entries, size = self._connection().execute(
+            'SELECT COUNT(*), SUM(size) FROM responses').fetchone()
+        return {
+            'entries': entries,
+            'bytes': size or 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expirations': self.expirations,
+            'revalidations': self.revalidations,
+        }
+
+    def close(self):
+        """
+        Close the connection held by the calling thread.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -0,0 +1,110 @@
+"""
+Incremental synchronisation of cashups into a local store.
+"""
+
+import json
+import os
+from kounta.objects import Company, Register, Site
+
+_replace = getattr(os, 'replace', os.rename)
+
+
+class CashupSync:
+    """
+    CashupSync keeps a local copy of the cashups of a company, site or register
+    up to date without downloading the whole history on every run.
+
+    For each object synced it records a high-water mark: the date of the
+    newest cashup seen. The next run asks only for `cashups/since/<mark>.json`
+    plus `cashups/unprocessed.json`, whose cashups may still change. The mark
+    is never later than the oldest unprocessed cashup, so that a cashup
+    processed after it has left `unprocessed.json` is fetched again. The marks
+    are kept as JSON in the file at `path` and are only written once an object
+    has been synced completely, so an interrupted run starts again from the
+    previous mark.
+
+    Cashups are merged into `store`, a mapping of cashup ID (as a string, so
+    that a shelve can be used) to the cashup dict returned by the API. A
+    cashup seen again replaces the stored one. The store must last as long as
+    the marks do, since later runs do not fetch the cashups before them again.
+    """
+
+    def __init__(self, path, store):
+        """
+        :param path: The file that holds the high-water marks.
+        :type path: str
+        :param store: For example a dict or a shelve.
+        :type store: dict
+        """
+        self.path = path
+        self.store = store
+        self.marks = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except IOError:
+            return {}
+
+    def _save(self):
+        # Write to a temporary file first so that a crash never leaves a
+        # half-written file behind.
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.marks, f, indent=2, sort_keys=True)
+        _replace(temporary, self.path)
+
+    def sync(self, *objects):
+        """
+        Fetch the cashups that are new or unprocessed since the last run for
+        each of `objects` and merge them into the store.
+        :type objects: Company|Site|Register
+        :rtype: int
+        :return: The number of cashups merged.
+        """
+        count = 0
+        for obj in objects:
+            count += self._sync(obj)
+        return count
+
+    def _sync(self, obj):
+        if not isinstance(obj, (Company, Site, Register)):
+            raise ValueError('cannot sync the cashups of %s' %
+                             type(obj).__name__)
+
+        key = obj._resource_url
+        mark = self.marks.get(key)
+        if mark is None:
+            # The first run fetches the whole history.
+            cashups = obj.iter_cashups(stream=True)
+        else:
+            # json gives back unicode on Python 2, which is not accepted as a
+            # date.
+            cashups = obj.iter_cashups(stream=True, since=str(mark))
+
+        count = 0
+        latest = mark
+        for cashup in cashups:
+            self.store[str(cashup.id)] = cashup.obj
+            created = cashup.obj['created_at'][:10]
+            if latest is None or created > latest:
+                latest = created
+            count += 1
+
+        for cashup in obj.iter_cashups(stream=True, unprocessed=True):
+            self.store[str(cashup.id)] = cashup.obj
+            # Once processed it only shows up in cashups/since/<mark>.json.
+            created = cashup.obj['created_at'][:10]
+            if latest is None or created < latest:
+                latest = created
+            count += 1
+
+        if latest is not None and latest != mark:
+            # The marks must never be ahead of what has been stored.
+            if hasattr(self.store, 'sync'):
+                self.store.sync()
+            self.marks[key] = latest
+            self._save()
+
+        return count
@@ -0,0 +1,418 @@
+import socket
+import threading
+import time
+import weakref
+import zlib
+
+try:
+    import http.client as httplib
+except ImportError:
+    import httplib
+
+
+class Response:
+    """
+    An HTTP response whose body is already in memory.
+    """
+
+    def __init__(self, status, reason, headers, body):
+        """
+        :type status: int
+        :type reason: str
+        :param headers: Header names are lower case.
+        :type headers: dict
+        :type body: bytes
+        """
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    @property
+    def size(self):
+        """
+        The number of (decompressed) bytes in the body.
+        :rtype: int
+        """
+        return len(self.body)
+
+    def read(self):
+        """
+        :rtype: bytes
+        """
+        return self.body
+
+    def iter_chunks(self):
+        """
+        :rtype: bytes[]
+        """
+        if self.body:
+            yield self.body
+
+    def close(self):
+        pass
+
+
+class StreamingResponse(Response):
+    """
+    An HTTP response whose body is read from the connection as it is consumed,
+    decompressing a gzip or deflate Content-Encoding on the fly. The
+    connection goes back to the pool once the whole body has been read, or is
+    closed if the response is abandoned part way through.
+    """
+
+    chunk_size = 65536
+
+    def __init__(self, pool, connection, raw):
+        """
+        :type pool: ConnectionPool
+        :type connection: httplib.HTTPConnection
+        :type raw: httplib.HTTPResponse
+        """
+        self.status = raw.status
+        self.reason = raw.reason
+        self.headers = dict((k.lower(), v) for k, v in raw.getheaders())
+        self._pool = pool
+        self._connection = connection
+        self._raw = raw
+        self._body = None
+        self._size = 0
+
+        encoding = self.headers.get('content-encoding', '').strip().lower()
+        if encoding in ('gzip', 'x-gzip', 'deflate'):
+            # 32 + MAX_WBITS accepts both gzip and zlib headers.
+            self._decompressor = zlib.decompressobj(32 + zlib.MAX_WBITS)
+        else:
+            self._decompressor = None
+
+    @property
+    def body(self):
+        """
+        Read the rest of the body into memory.
+        :rtype: bytes
+        """
+        if self._body is None:
+            self._body = b''.join(self.iter_chunks())
+        return self._body
+
+    @property
+    def size(self):
+        return self._size
+
+    def iter_chunks(self):
+        """
+        Yield the decompressed body in chunks as they arrive. This can only be
+        done once.
+        :rtype: bytes[]
+        """
+        if self._connection is None:
+            if self._body:
+                yield self._body
+            return
+
+        try:
+            while True:
+                data = self._raw.read(self.chunk_size)
+                if not data:
+                    break
+                data = self._decompress(data)
+                self._size += len(data)
+                if data:
+                    yield data
+
+            if self._decompressor is not None:
+                data = self._decompressor.flush()
+                self._size += len(data)
+                if data:
+                    yield data
+        except BaseException:
+            # Includes GeneratorExit when the consumer stops early.
+            self._abandon()
+            raise
+
+        self._finish()
+
+    def _decompress(self, data):
+        if self._decompressor is None:
+            return data
+
+        try:
+            return self._decompressor.decompress(data)
+        except zlib.error:
+            if self._size:
+                raise
+            # Some servers send a raw deflate stream without the zlib header.
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._decompressor.decompress(data)
+
+    def _finish(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        if self._raw.will_close:
+            self._pool._discard(connection)
+        else:
+            self._pool._release(connection)
+
+    def _abandon(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            self._pool._discard(connection)
+
+    def close(self):
+        """
+        Give the connection back. A small unread body is drained so that the
+        connection can be reused; otherwise it is closed.
+        """
+        if self._connection is None:
+            return
+        length = self._raw.length
+        if length is not None and length <= self.chunk_size:
+            self._body = self.body
+        else:
+            self._abandon()
+
+
+class ConnectionPool:
+    """
+    ConnectionPool keeps persistent (keep-alive) connections to a single host
+    so that consecutive requests do not each pay for a new TCP and TLS
+    handshake.
+
+    At most `max_size` connections are open at any time; a request made while
+    they are all busy will wait for one to be released. A thread that already
+    holds a connection (for example for a streamed response) does not wait on
+    the others, which may be waiting for it: it uses one reserved connection
+    beyond `max_size`. Connections that have not been used for `idle_timeout`
+    seconds are closed by a background reaper thread, so a client that goes
+    quiet does not hold sockets open forever.
+    The reaper stops when the pool is closed or garbage collected.
+    """
+
+    def __init__(self, host, port=None, secure=True, max_size=4,
+                 idle_timeout=30, timeout=60):
+        """
+        :type host: str
+        :type port: int|None
+        :type secure: bool
+        :type max_size: int
+        :type idle_timeout: float
+        :type timeout: float
+        """
+        if max_size < 1:
+            raise ValueError('max_size must be at least 1')
+
+        self.host = host
+        self.port = port
+        self.secure = secure
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.connections_opened = 0
+
+        self._idle = []
+        self._open = 0
+        # The thread holding each connection that is in use.
+        self._owners = {}
+        # The connection opened beyond max_size, if it is in use.
+        self._reserved = None
+        self._closed = False
+        self._condition = threading.Condition()
+        # The reaper sleeps on its own event so that a notify() meant for a
+        # waiting request can never wake it instead.
+        self._stop = threading.Event()
+        self._reaper = None
+
+    def _new_connection(self):
+        if self.secure:
+            connection_class = httplib.HTTPSConnection
+        else:
+            connection_class = httplib.HTTPConnection
+
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self):
+        """
+        Take an idle connection (most recently used first) or open a new one if
+        the pool has not reached `max_size`. Otherwise block until another
+        request releases a connection.
+
+        A thread that already holds a connection opens the reserved connection
+        instead of waiting, or waits only for another thread to give the
+        reserved connection back. If it holds the reserved connection itself
+        RuntimeError is raised, since waiting could never end.
+        """
+        owner = threading.current_thread().ident
+        reserved = False
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError('connection pool has been closed')
+
+                if self._idle:
+                    connection = self._idle.pop()[0]
+                    self._owners[connection] = owner
+                    return connection
+
+                if self._open < self.max_size:
+                    self._open += 1
+                    self.connections_opened += 1
+                    break
+
+                if owner in self._owners.values():
+                    if self._reserved is None:
+                        self._open += 1
+                        self.connections_opened += 1
+                        self._reserved = reserved = True
+                        break
+                    if self._owners.get(self._reserved) == owner:
+                        raise RuntimeError(
+                            'this thread already holds the reserved '
+                            'connection (for example for a streamed response '
+                            'that is still being read), so waiting for '
+                            'another would never end')
+
+                self._condition.wait()
+
+        try:
+            connection = self._new_connection()
+        except Exception:
+            if reserved:
+                with self._condition:
+                    self._reserved = None
+                    self._condition.notify_all()
+            self._discard(None)
+            raise
+        with self._condition:
+            self._owners[connection] = owner
+            if reserved:
+                self._reserved = connection
+        return connection
+
+    def _release(self, connection):
+        with self._condition:
+            self._owners.pop(connection, None)
+            if connection is self._reserved:
+                self._reserved = None
+                self._open -= 1
+                connection.close()
+                self._condition.notify_all()
+                return
+            if self._closed:
+                self._open -= 1
+                connection.close()
+            else:
+                self._idle.append((connection, time.time()))
+                self._start_reaper()
+            self._condition.notify()
+
+    def _discard(self, connection):
+        if connection is not None:
+            connection.close()
+
+        with self._condition:
+            self._owners.pop(connection, None)
+            if connection is not None and connection is self._reserved:
+                self._reserved = None
+                self._condition.notify_all()
+            self._open -= 1
+            self._condition.notify()
+
+    def _start_reaper(self):
+        # Must be called while holding self._condition.
+        if self._reaper is not None or not self.idle_timeout:
+            return
+
+        # The reaper only holds the pool weakly, and is woken to stop once the
+        # pool has been garbage collected, so that a client dropped without
+        # close() does not leave a thread behind.
+        stop = self._stop
+        pool = weakref.ref(self, lambda ref: stop.set())
+        interval = max(self.idle_timeout / 2.0, 0.01)
+        self._reaper = threading.Thread(target=_reap_forever,
+                                        args=(pool, stop, interval))
+        self._reaper.daemon = True
+        self._reaper.start()
+
+    def reap(self):
+        """
+        Close every connection that has been idle for longer than
+        `idle_timeout`. This is called periodically by the reaper thread but
+        can also be called directly.
+
+        :rtype: int
+        :return: The number of connections that were closed.
+        """
+        with self._condition:
+            deadline = time.time() - self.idle_timeout
+            stale = [c for c, used in self._idle if used <= deadline]
+            self._idle = [(c, used) for c, used in self._idle if used > deadline]
+            self._open -= len(stale)
+            if stale:
+                self._condition.notify_all()
+
+        for connection in stale:
+            connection.close()
+
+        return len(stale)
+
+    def request(self, method, url, headers=None, stream=False):
+        """
+        Perform a request. A connection that was dropped by the server while it
+        sat idle is retried once on a fresh connection.
+
+        Unless `stream` is set the whole body is read before returning.
+        Otherwise the body is read as it is consumed and the connection is held
+        until then (see StreamingResponse).
+
+        :type method: str
+        :type url: str
+        :type headers: dict|None
+        :type stream: bool
+        :rtype: StreamingResponse
+        """
+        for attempt in (1, 2):
+            connection = self._acquire()
+            reused = connection.sock is not None
+            try:
+                connection.request(method, url, headers=headers or {})
+                raw = connection.getresponse()
+            except (httplib.HTTPException, socket.error):
+                self._discard(connection)
+                if reused and attempt == 1:
+                    continue
+                raise
+
+            response = StreamingResponse(self, connection, raw)
+            if not stream:
+                response.read()
+            return response
+
+    def close(self):
+        """
+        Close all idle connections and stop the reaper. Connections that are
+        currently in use are closed as soon as they are released.
+        """
+        with self._condition:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self._open -= len(idle)
+            self._condition.notify_all()
+        self._stop.set()
+
+        for connection, used in idle:
+            connection.close()
+
+
+def _reap_forever(pool, stop, interval):
+    """
+    Call reap() on the pool behind the weak reference `pool` every `interval`
+    seconds until `stop` is set or the pool is gone.
+    """
+    while not stop.wait(interval):
+        strong = pool()
+        if strong is None:
+            return
+        strong.reap()
+        strong = None
@@ -8,5 +8,18 @@ setup(
     license='MIT',
     keywords='kounta',
     url='https://github.com/elliotchance/kounta-python',
+    python_requires='>=2.7, !=3.0.*, !=3.1.*',
+    classifiers=[
+        'Programming Language :: Python :: 2',
+        'Programming Language :: Python :: 2.7',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3.2',
+        'Programming Language :: Python :: 3.3',
+        'Programming Language :: Python :: 3.4',
+    ],
     install_requires = ['python-dateutil'],
+    extras_require = {
+        'arrow': ['pyarrow'],
+        'numpy': ['numpy'],
+    },
 )
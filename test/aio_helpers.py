@@ -0,0 +1,22 @@
+"""
+Coroutines used by test_aio. They live in their own module because
+`async def` is a syntax error before Python 3.5, so this module is only
+imported on 3.5 and newer.
+"""
+
+import asyncio
+
+
+async def walk(client):
+    company = await client.company
+    sites = await company.sites
+    return sites, await asyncio.gather(*[site.cashups() for site in sites])
+
+
+async def get_twice(client, url):
+    await client.get_url(url)
+    await client.get_url(url)
+
+
+async def get_concurrently(client, url, times):
+    return await asyncio.gather(*[client.get_url(url) for i in range(times)])
@@ -0,0 +1,103 @@
+"""
+A small local HTTP/1.1 server used as a stand-in for api.kounta.com in tests.
+"""
+
+import json
+import threading
+from kounta.transport import Response
+from mock import MagicMock
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+def response(body, status=200, headers=None):
+    """
+    Build a Response to be returned from a mocked BasicClient._fetch_url().
+    :rtype: Response
+    """
+    return Response(status, 'OK', headers or {}, body)
+
+
+def json_responses(responses):
+    """
+    Build a mock for BasicClient._fetch_url() that answers each URL with the
+    JSON encoding of `responses[url]`. The dict is read on every call, so
+    tests can change it as they go.
+    :type responses: dict
+    :rtype: MagicMock
+    """
+    return MagicMock(side_effect=lambda url, headers=None: response(
+        json.dumps(responses[url])))
+
+
+class _ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.stand_in.lock:
+            self.server.stand_in.connections += 1
+
+    def do_GET(self):
+        stand_in = self.server.stand_in
+        # Python 2 hands the header names over in lower case, so they are
+        # recorded that way on every version.
+        headers = dict((name.lower(), value)
+                       for name, value in self.headers.items())
+        with stand_in.lock:
+            stand_in.requests.append((self.path, headers))
+        route = stand_in.routes.get(self.path)
+        if route is None:
+            status, headers, body = 404, {}, b'{}'
+        elif callable(route):
+            status, headers, body = route(self)
+        else:
+            status, headers, body = route
+
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer:
+    """
+    Serves fixed responses from `routes`, a dict of path to either a
+    (status, headers, body) tuple or a callable taking the request handler and
+    returning such a tuple. Each request is recorded in `requests` as a tuple
+    of its path and a dict of its headers, keyed by lower-case name.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = routes or {}
+        self.requests = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._server = _ThreadingServer(('127.0.0.1', 0), _Handler)
+        self._server.stand_in = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        args=(0.05,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
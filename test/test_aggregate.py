@@ -0,0 +1,70 @@
+from unittest import TestCase, skipIf
+from datetime import date
+from kounta import aggregate
+from kounta.client import BasicClient
+from kounta.objects import Cashup
+import copy
+import json
+
+
+@skipIf(aggregate.numpy is None, 'numpy is not installed')
+class TestReconciliations(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        first = json.loads(open('test/cashup.json', 'r').read())
+        second = copy.deepcopy(first)
+        second['id'] = 19763
+        second['register']['id'] = 9092
+        second['created_at'] = '2013-04-30T20:08:21+11:00'
+        self.cashups = [first, first, second]
+
+    def test_columns(self):
+        reconciliations = aggregate.Reconciliations(self.cashups)
+        self.assertEqual(len(reconciliations), 6)
+        self.assertEqual(reconciliations.site_id.tolist(), [985] * 6)
+        self.assertEqual(reconciliations.variance[0], 1415.8 - 1424.65)
+
+    def test_accepts_objects(self):
+        client = BasicClient('', '')
+        cashups = [Cashup(cashup, client, None) for cashup in self.cashups]
+        self.assertEqual(len(aggregate.Reconciliations(cashups)), 6)
+
+    def test_group_by_every_key(self):
+        rows = aggregate.variance(self.cashups)
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['site_id'], 985)
+        self.assertEqual(rows[0]['register_id'], 9091)
+        self.assertEqual(rows[0]['payment_method_id'], 1)
+        self.assertEqual(rows[0]['day'], date(2013, 4, 29))
+        self.assertEqual(rows[0]['count'], 2)
+        self.assertAlmostEqual(rows[0]['variance'], 2 * (1415.8 - 1424.65))
+        self.assertEqual(rows[0]['cash_in'], 40)
+        self.assertAlmostEqual(rows[0]['cash_out'], 150.8)
+
+    def test_group_by_one_key(self):
+        rows = aggregate.variance(self.cashups, 'payment_method_id')
+        self.assertEqual([(row['payment_method_id'], row['count'])
+                          for row in rows], [(1, 3), (2, 3)])
+        self.assertEqual(set(rows[0]), set(('payment_method_id', 'count') +
+                                           aggregate.AMOUNTS +
+                                           ('variance',)))
+
+    def test_group_by_day(self):
+        rows = aggregate.variance(self.cashups, ['day'])
+        self.assertEqual([row['day'] for row in rows],
+                         [date(2013, 4, 29), date(2013, 4, 30)])
+
+    def test_missing_values(self):
+        rows = aggregate.variance([{'id': 1, 'reconciliations': [{}]}])
+        self.assertEqual(rows, [{
+            'site_id': None, 'register_id': None, 'payment_method_id': None,
+            'day': None, 'count': 1, 'recorded': 0, 'counted': 0,
+            'cash_in': 0, 'cash_out': 0, 'variance': 0,
+        }])
+
+    def test_empty(self):
+        self.assertEqual(aggregate.variance([]), [])
+
+    def test_unknown_key(self):
+        reconciliations = aggregate.Reconciliations(self.cashups)
+        self.assertRaises(ValueError, reconciliations.group, 'staff_id')
@@ -0,0 +1,87 @@
+from unittest import TestCase, skipIf
+from kounta.inventory import StockMatrix
+from kounta.objects import Company, Site, Cashup
+from mock import MagicMock
+from test.server import response
+import json
+import sys
+
+if sys.version_info >= (3, 5):
+    import asyncio
+    from kounta.aio import AsyncClient
+    from test.aio_helpers import get_concurrently, get_twice, walk
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@skipIf(sys.version_info < (3, 5), 'asyncio client needs Python 3.5+')
+class TestAsyncClient(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.client = AsyncClient('', '')
+        self.responses = {
+            '/v1/companies/me.json': '{"id":5678}',
+            '/v1/companies/5678/sites.json': '[{"id":1},{"id":2}]',
+            '/v1/companies/5678/sites/1/cashups.json': '[{"id":11}]',
+            '/v1/companies/5678/sites/2/cashups.json': '[{"id":21}]',
+        }
+        self.client._fetch_url = MagicMock(
+            side_effect=lambda url: response(self.responses[url]))
+
+    def tearDown(self):
+        self.client.close()
+        TestCase.tearDown(self)
+
+    def test_get_url_is_a_coroutine(self):
+        self.assertEqual(run(self.client.get_url('/v1/companies/me.json')),
+                         {'id': 5678})
+
+    def test_company(self):
+        company = run(self.client.company)
+        self.assertTrue(isinstance(company, Company))
+        self.assertEqual(company.id, 5678)
+
+    def test_walk_object_graph(self):
+        sites, cashups = run(walk(self.client))
+        self.assertTrue(isinstance(sites[0], Site))
+        self.assertTrue(isinstance(cashups[1][0], Cashup))
+        self.assertEqual([c[0].id for c in cashups], [11, 21])
+
+    def test_index_lookup_is_awaitable(self):
+        company = Company({'id': 5678}, self.client, None)
+        site = run(company.site(2))
+        self.assertTrue(isinstance(site, Site))
+        self.assertEqual(site.id, 2)
+
+    def test_stock_levels_are_awaitable(self):
+        self.responses['/v1/companies/5678/sites/1/inventory.json'] = \
+            '[{"id":829,"stock":3}]'
+        self.responses['/v1/companies/5678/sites/2/inventory.json'] = \
+            '[{"id":829,"stock":4}]'
+        company = Company({'id': 5678}, self.client, None)
+        matrix = run(company.stock_levels(max_workers=1))
+        self.assertTrue(isinstance(matrix, StockMatrix))
+        self.assertEqual(matrix.product(829), {1: 3, 2: 4})
+
+    def test_results_are_cached(self):
+        run(get_twice(self.client, '/v1/companies/me.json'))
+        self.client._fetch_url.assert_called_once_with('/v1/companies/me.json')
+
+    def test_concurrent_requests_for_one_url_share_a_fetch(self):
+        results = run(get_concurrently(
+            self.client, '/v1/companies/5678/sites.json', 5))
+        self.assertEqual(self.client._fetch_url.call_count, 1)
+        self.assertEqual(results[4], json.loads(
+            self.responses['/v1/companies/5678/sites.json']))
+
+    def test_get_urls(self):
+        urls = ['/v1/companies/5678/sites/2/cashups.json',
+                '/v1/companies/me.json']
+        self.assertEqual(run(self.client.get_urls(urls)),
+                         [[{'id': 21}], {'id': 5678}])
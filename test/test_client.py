@@ -1,9 +1,13 @@
 from unittest import TestCase
 from kounta.client import BasicClient, URLCache
-from kounta.objects import Company
-from mock import MagicMock
+from kounta.objects import Company, Site, Takings
+from mock import MagicMock, patch
+from kounta.transport import ConnectionPool
+from test.server import StandInServer, response
 import json
 import os
+import threading
+import time
 
 class TestBasicClient(TestCase):
     def get_config(self):
@@ -32,7 +36,7 @@ class TestBasicClient(TestCase):
         self.assertEqual(company.id, 5735)
 
     def test_company_is_cached(self):
-        self.client._fetch_url = MagicMock(return_value='{}')
+        self.client._fetch_url = MagicMock(return_value=response('{}'))
         # noinspection PyStatementEffect
         self.client.company
         # noinspection PyStatementEffect
@@ -45,14 +49,14 @@ class TestBasicClient(TestCase):
         self.assertTrue(isinstance(self.client._cache, URLCache))
 
     def test_company_uses_urlcache(self):
-        self.client._fetch_url = MagicMock(return_value='{}')
+        self.client._fetch_url = MagicMock(return_value=response('{}'))
         # noinspection PyStatementEffect
         self.client.company
         url = '/v1/companies/me.json'
         self.assertEqual(self.client._cache[url], {})
 
     def test_reset_cache(self):
-        self.client._fetch_url = MagicMock(return_value='{"a":"b"}')
+        self.client._fetch_url = MagicMock(return_value=response('{"a":"b"}'))
         # noinspection PyStatementEffect
         self.client.company
         url = '/v1/companies/me.json'
@@ -76,3 +80,335 @@ class TestURLCache(TestCase):
         self.cache['foo'] = 'bar'
         self.cache['bar'] = 'baz'
         self.assertEqual(self.cache['foo'], 'bar')
+
+    def test_touching_a_missing_entry_is_not_a_revalidation(self):
+        self.cache.touch('foo')
+        self.assertEqual(self.cache.revalidations, 0)
+        self.cache['foo'] = 'bar'
+        self.cache.touch('foo')
+        self.assertEqual(self.cache.revalidations, 1)
+
+
+class TestGetUrls(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.client = BasicClient('', '')
+        self.client._fetch_url = MagicMock(
+            side_effect=lambda url: response('"%s"' % url))
+
+    def test_results_are_in_input_order(self):
+        urls = ['/%d.json' % i for i in range(20)]
+        self.assertEqual(self.client.get_urls(urls, max_workers=4), urls)
+
+    def test_fills_the_cache(self):
+        self.client.get_urls(['/a.json', '/b.json'])
+        self.assertEqual(self.client._cache['/b.json'], '/b.json')
+
+    def test_cached_urls_are_not_fetched_again(self):
+        self.client.get_url('/a.json')
+        self.client.get_urls(['/a.json', '/b.json'])
+        self.assertEqual(self.client._fetch_url.call_count, 2)
+
+    def test_duplicate_urls_are_fetched_once(self):
+        results = self.client.get_urls(['/a.json', '/a.json'])
+        self.assertEqual(results, ['/a.json', '/a.json'])
+        self.client._fetch_url.assert_called_once_with('/a.json')
+
+    def test_empty(self):
+        self.assertEqual(self.client.get_urls([]), [])
+
+
+class TestBoundedURLCache(TestCase):
+    def test_max_entries_evicts_least_recently_used(self):
+        cache = URLCache(max_entries=2)
+        cache['a'] = 1
+        cache['b'] = 2
+        # noinspection PyStatementEffect
+        cache['a']
+        cache['c'] = 3
+        self.assertEqual(cache['b'], None)
+        self.assertEqual(cache['a'], 1)
+        self.assertEqual(cache['c'], 3)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_max_bytes(self):
+        cache = URLCache(max_bytes=10)
+        cache.set('a', 1, 6)
+        cache.set('b', 2, 4)
+        self.assertEqual(len(cache), 2)
+        cache.set('c', 3, 1)
+        self.assertEqual(cache['a'], None)
+        self.assertEqual(cache.size, 5)
+
+    def test_max_bytes_estimates_size_of_values(self):
+        cache = URLCache(max_bytes=10)
+        cache['a'] = 'abcdefghijklmnop'
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_replacing_an_entry_updates_size(self):
+        cache = URLCache()
+        cache.set('a', 1, 6)
+        cache.set('a', 2, 4)
+        self.assertEqual(cache.size, 4)
+
+    def test_ttl(self):
+        cache = URLCache(ttl=60)
+        with patch('kounta.client.time') as clock:
+            clock.time.return_value = 1000
+            cache['a'] = 1
+            clock.time.return_value = 1059
+            self.assertEqual(cache['a'], 1)
+            clock.time.return_value = 1060
+            self.assertEqual(cache['a'], None)
+        self.assertEqual(cache.expirations, 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_stats(self):
+        cache = URLCache(max_entries=1)
+        cache['a'] = 1
+        # noinspection PyStatementEffect
+        cache['a']
+        # noinspection PyStatementEffect
+        cache['b']
+        cache['b'] = 2
+        self.assertEqual(cache.stats(), {
+            'entries': 1,
+            'bytes': 0,
+            'hits': 1,
+            'misses': 1,
+            'evictions': 1,
+            'expirations': 0,
+            'revalidations': 0,
+        })
+
+    def test_delete(self):
+        cache = URLCache()
+        cache['a'] = 1
+        del cache['a']
+        self.assertEqual(cache['a'], None)
+
+    def test_client_uses_given_cache(self):
+        cache = URLCache(max_entries=5)
+        client = BasicClient('', '', cache=cache)
+        client._fetch_url = MagicMock(return_value=response('{"id":1}'))
+        client.get_url('/v1/companies/me.json')
+        self.assertEqual(cache.size, 8)
+        client.reset_cache()
+        self.assertTrue(client._cache is cache)
+        self.assertEqual(len(cache), 0)
+
+
+class TestInvalidation(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.client = BasicClient('', '')
+        self.cache = self.client._cache
+        self.urls = [
+            '/v1/companies/5678/sites.json',
+            '/v1/companies/5678/sites/42.json',
+            '/v1/companies/5678/sites/42/cashups.json',
+            '/v1/companies/5678/sites/42/categories.json',
+            '/v1/companies/5678/sites/421/categories.json',
+            '/v1/companies/5678/registers/9091/cashups.json',
+        ]
+        for url in self.urls:
+            self.cache.set(url, [], 10)
+
+    def test_invalidate_prefix(self):
+        prefix = '/v1/companies/5678/sites/42/'
+        self.assertEqual(self.client.invalidate_prefix(prefix), 2)
+        self.assertFalse(self.urls[2] in self.cache)
+        self.assertFalse(self.urls[3] in self.cache)
+        self.assertTrue(self.urls[4] in self.cache)
+        self.assertEqual(self.cache.size, 40)
+
+    def test_invalidate_partial_segment(self):
+        self.assertEqual(self.cache.invalidate_prefix('/v1/companies/5678/s'),
+                         5)
+        self.assertEqual(list(self.cache.cache.keys()), [self.urls[5]])
+
+    def test_invalidate_unknown_prefix(self):
+        self.assertEqual(self.cache.invalidate_prefix('/v2/'), 0)
+        self.assertEqual(len(self.cache), 6)
+
+    def test_invalidated_branches_are_pruned(self):
+        self.cache.invalidate_prefix('/v1/companies/5678/')
+        self.assertEqual(self.cache.index.root, ({}, set()))
+
+    def test_evicted_entries_leave_the_index(self):
+        cache = URLCache(max_entries=1)
+        cache['/a/b.json'] = 1
+        cache['/c.json'] = 2
+        self.assertEqual(cache.invalidate_prefix('/a/'), 0)
+        self.assertEqual(cache['/c.json'], 2)
+
+    def test_invalidate_object(self):
+        company = Company({'id': 5678}, self.client, None)
+        site = Site({'id': 42}, self.client, company)
+        self.assertEqual(self.client.invalidate(site), 3)
+        self.assertEqual(len(self.cache), 3)
+        self.assertTrue(self.urls[0] in self.cache)
+
+    def test_invalidate_company(self):
+        company = Company({'id': 5678}, self.client, None)
+        self.assertEqual(self.client.invalidate(company), 6)
+
+    def test_invalidate_object_without_endpoint(self):
+        self.assertRaises(ValueError, self.client.invalidate,
+                          Takings({}, self.client, None))
+
+
+class TestRevalidation(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.server = StandInServer({
+            '/etag.json': self.etag,
+            '/modified.json': self.last_modified,
+            '/plain.json': (200, {}, '[1]'),
+        })
+        self.body = '{"version":1}'
+        pool = ConnectionPool('127.0.0.1', self.server.port, secure=False)
+        self.cache = URLCache(ttl=60)
+        self.client = BasicClient('', '', pool=pool, cache=self.cache)
+        self.patch = patch('kounta.client.time')
+        self.clock = self.patch.start()
+        self.clock.time.return_value = 1000
+
+    def tearDown(self):
+        self.patch.stop()
+        self.client.close()
+        self.server.stop()
+        TestCase.tearDown(self)
+
+    def etag(self, request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return 304, {'ETag': '"v1"'}, ''
+        return 200, {'ETag': '"v1"'}, self.body
+
+    def last_modified(self, request):
+        modified = 'Tue, 15 Nov 1994 12:45:26 GMT'
+        if request.headers.get('If-Modified-Since') == modified:
+            return 304, {}, ''
+        return 200, {'Last-Modified': modified}, self.body
+
+    def expire(self):
+        self.clock.time.return_value += 61
+
+    def test_not_modified_keeps_the_decoded_value(self):
+        first = self.client.get_url('/etag.json')
+        self.expire()
+        self.assertTrue(self.client.get_url('/etag.json') is first)
+        self.assertEqual(self.server.requests[1][1]['if-none-match'], '"v1"')
+        self.assertEqual(self.cache.revalidations, 1)
+
+    def test_revalidated_entry_is_fresh_again(self):
+        self.client.get_url('/etag.json')
+        self.expire()
+        self.client.get_url('/etag.json')
+        self.client.get_url('/etag.json')
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_last_modified(self):
+        self.client.get_url('/modified.json')
+        self.expire()
+        self.client.get_url('/modified.json')
+        self.assertEqual(self.server.requests[1][1]['if-modified-since'],
+                         'Tue, 15 Nov 1994 12:45:26 GMT')
+        self.assertEqual(self.cache.revalidations, 1)
+
+    def test_modified_response_replaces_the_value(self):
+        self.client.get_url('/etag.json')
+        self.expire()
+        self.server.routes['/etag.json'] = (200, {'ETag': '"v2"'},
+                                            '{"version":2}')
+        self.assertEqual(self.client.get_url('/etag.json'), {'version': 2})
+        self.assertEqual(self.cache.stale('/etag.json')[1], '"v2"')
+
+    def test_entries_without_validators_are_refetched(self):
+        self.client.get_url('/plain.json')
+        self.expire()
+        self.client.get_url('/plain.json')
+        self.assertFalse('if-none-match' in self.server.requests[1][1])
+        self.assertEqual(self.cache.revalidations, 0)
+
+
+class TestSingleFlight(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.client = BasicClient('', '')
+        self.release = threading.Event()
+
+    def slow_fetch(self, url):
+        self.release.wait(5)
+        return response('{"url":"%s"}' % url)
+
+    def get_concurrently(self, urls):
+        results = []
+        threads = [threading.Thread(
+            target=lambda u: results.append(self.client.get_url(u)), args=(url,))
+            for url in urls]
+        for thread in threads:
+            thread.start()
+        while self.client.fetches + self.client.coalesced < len(urls):
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_misses_share_one_fetch(self):
+        self.client._fetch_url = MagicMock(side_effect=self.slow_fetch)
+        results = self.get_concurrently(['/a.json'] * 8)
+        self.client._fetch_url.assert_called_once_with('/a.json')
+        self.assertEqual(self.client.fetches, 1)
+        self.assertEqual(self.client.coalesced, 7)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_a_miss_is_counted_once(self):
+        self.client._fetch_url = MagicMock(return_value=response('{}'))
+        self.client.get_url('/a.json')
+        self.client.get_urls(['/b.json'])
+        self.assertEqual(self.client._cache.misses, 2)
+
+    def test_an_expired_entry_is_counted_once(self):
+        cache = URLCache(ttl=60)
+        self.client = BasicClient('', '', cache=cache)
+        self.client._fetch_url = MagicMock(return_value=response('{}'))
+        with patch('kounta.client.time') as clock:
+            clock.time.return_value = 1000
+            self.client.get_url('/a.json')
+            clock.time.return_value = 1060
+            self.client.get_url('/a.json')
+        self.assertEqual((cache.misses, cache.expirations), (2, 1))
+
+    def test_different_urls_are_not_coalesced(self):
+        self.client._fetch_url = MagicMock(side_effect=self.slow_fetch)
+        self.get_concurrently(['/a.json', '/b.json'])
+        self.assertEqual(self.client.fetches, 2)
+        self.assertEqual(self.client.coalesced, 0)
+
+    def test_errors_are_shared(self):
+        errors = []
+
+        def fail(url):
+            self.release.wait(5)
+            raise IOError('down')
+
+        def get():
+            try:
+                self.client.get_url('/a.json')
+            except IOError as e:
+                errors.append(e)
+
+        self.client._fetch_url = MagicMock(side_effect=fail)
+        threads = [threading.Thread(target=get) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        while self.client.fetches + self.client.coalesced < 3:
+            time.sleep(0.001)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(self.client._flights, {})
@@ -0,0 +1,96 @@
+from unittest import TestCase, skipIf
+from kounta import columnar
+from kounta.client import BasicClient
+from kounta.objects import Cashup
+from dateutil.parser import parse
+import json
+import shutil
+import tempfile
+
+
+class TestColumns(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.cashup = json.loads(open('test/cashup.json', 'r').read())
+
+    def columns(self, cashups, batch_size=65536):
+        return list(columnar.iter_columns(cashups, batch_size))
+
+    def test_tables(self):
+        batches = dict(self.columns([self.cashup]))
+        self.assertEqual(sorted(batches), ['cashups', 'income_accounts',
+                                           'reconciliations'])
+        for table, columns in batches.items():
+            self.assertEqual(len(columns), len(columnar.COLUMNS[table]))
+
+    def test_cashup_row(self):
+        columns = dict(self.columns([self.cashup]))['cashups']
+        self.assertEqual([column[0] for column in columns], [
+            19762, 27, False, True, 9091, 985, 389427,
+            parse('2013-04-29T20:08:21+11:00')])
+
+    def test_reconciliation_rows(self):
+        columns = dict(self.columns([self.cashup]))['reconciliations']
+        names = [name for name, kind in columnar.COLUMNS['reconciliations']]
+        row = dict(zip(names, [column[0] for column in columns]))
+        self.assertEqual(len(columns[0]), 2)
+        self.assertEqual(row['cashup_id'], 19762)
+        self.assertEqual(row['payment_method'], 'Cash')
+        self.assertEqual(row['counted'], 1415.8)
+        self.assertEqual(row['cash_out'], 75.4)
+
+    def test_income_account_rows(self):
+        columns = dict(self.columns([self.cashup]))['income_accounts']
+        self.assertEqual(columns[4], ['200', '200'])
+        self.assertEqual(columns[5], [829, 844])
+
+    def test_accepts_objects(self):
+        cashup = Cashup(self.cashup, BasicClient('', ''), None)
+        self.assertEqual(self.columns([cashup]), self.columns([self.cashup]))
+
+    def test_batch_size(self):
+        batches = self.columns([self.cashup] * 5, batch_size=2)
+        sizes = [(table, len(columns[0])) for table, columns in batches
+                 if table == 'cashups']
+        self.assertEqual(sizes, [('cashups', 2), ('cashups', 2),
+                                 ('cashups', 1)])
+
+    def test_missing_nested_objects(self):
+        batches = dict(self.columns([{'id': 1}]))
+        self.assertEqual(list(batches), ['cashups'])
+        self.assertEqual(batches['cashups'][4], [None])
+
+
+@skipIf(columnar.pyarrow is None, 'pyarrow is not installed')
+class TestArrow(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.cashup = json.loads(open('test/cashup.json', 'r').read())
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def test_schema_types(self):
+        schema = columnar.schema('reconciliations')
+        self.assertEqual(str(schema.field('cashup_id').type), 'int64')
+        self.assertEqual(str(schema.field('counted').type), 'double')
+        self.assertEqual(str(schema.field('created_at').type),
+                         'timestamp[us, tz=UTC]')
+
+    def test_write_parquet(self):
+        import pyarrow.parquet
+        counts = columnar.write_parquet([self.cashup] * 3, self.directory)
+        self.assertEqual(counts, {'cashups': 3, 'reconciliations': 6,
+                                  'income_accounts': 6})
+        table = pyarrow.parquet.read_table(self.directory +
+                                           '/reconciliations.parquet')
+        self.assertEqual(table.column('recorded').to_pylist()[:2],
+                         [1424.65, 2380.2])
+
+    def test_write_arrow(self):
+        import pyarrow.ipc
+        columnar.write_arrow([self.cashup], self.directory)
+        reader = pyarrow.ipc.open_file(self.directory + '/cashups.arrow')
+        self.assertEqual(reader.read_all().column('id').to_pylist(), [19762])
@@ -0,0 +1,117 @@
+from unittest import TestCase
+from kounta import export
+from kounta.client import BasicClient
+from kounta.objects import Company
+from kounta.transport import ConnectionPool
+from test.server import StandInServer
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+
+
+class TestExport(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        cashup = open('test/cashup.json').read()
+        self.server = StandInServer({
+            '/v1/companies/5678/sites.json': (
+                200, {}, '[{"id": 1, "name": "Downtown"}, {"id": 2}]'),
+            '/v1/companies/5678/sites/1/cashups.json': (
+                200, {}, '[%s, %s]' % (cashup, cashup)),
+            '/v1/companies/5678/sites/2/cashups.json': (200, {}, '[]'),
+            '/v1/companies/5678/sites/1/cashups/since/2013-04-01.json': (
+                200, {}, '[%s]' % cashup),
+            '/v1/companies/5678/sites/2/cashups/since/2013-04-01.json': (
+                200, {}, '[]'),
+        })
+        pool = ConnectionPool('127.0.0.1', self.server.port, secure=False)
+        self.client = BasicClient('id', 'secret', pool=pool)
+        self.company = Company({'id': 5678}, self.client, None)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_reconciliation_rows(self):
+        rows = list(export.iter_reconciliations(self.company))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0], {
+            'site_id': 1, 'site_name': 'Downtown', 'cashup_id': 19762,
+            'cashup_number': 27, 'register_id': 9091, 'processed': False,
+            'created_at': '2013-04-29T20:08:21+11:00',
+            'payment_method_id': 1, 'payment_method': 'Cash',
+            'ledger_code': '200', 'recorded': 1424.65, 'counted': 1415.8,
+            'cash_in': 20, 'cash_out': 75.4,
+        })
+        self.assertEqual(set(rows[0]), set(export.RECONCILIATION_FIELDS))
+
+    def test_income_account_rows(self):
+        rows = list(export.iter_income_accounts(self.company))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual((rows[0]['tax_id'], rows[0]['net']), (829, 45.45))
+        self.assertEqual(set(rows[0]), set(export.INCOME_ACCOUNT_FIELDS))
+
+    def test_filters(self):
+        rows = export.iter_reconciliations(self.company, since='2013-04-01')
+        self.assertEqual(len(list(rows)), 2)
+
+    def test_ndjson(self):
+        path = self.path('cashups.ndjson')
+        self.assertEqual(export.export(self.company, path), 4)
+        with open(path) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(json.loads(lines[1])['payment_method'],
+                         'Credit Card')
+
+    def test_csv(self):
+        path = self.path('cashups.csv')
+        count = export.export(self.company, path, format='csv',
+                              kind='income_accounts')
+        self.assertEqual(count, 4)
+        with io.open(path, newline='') as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+        self.assertEqual(tuple(reader.fieldnames),
+                         export.INCOME_ACCOUNT_FIELDS)
+        self.assertEqual(rows[0]['net'], '45.45')
+
+    def test_non_ascii(self):
+        self.server.routes['/v1/companies/5678/sites.json'] = (
+            200, {}, b'[{"id": 1, "name": "Caf\xc3\xa9"}]')
+        name = b'Caf\xc3\xa9'.decode('utf-8')
+        path = self.path('cashups.ndjson')
+        export.export(self.company, path)
+        with io.open(path, encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())['site_name'], name)
+        path = self.path('cashups.csv')
+        export.export(self.company, path, format='csv')
+        with io.open(path, encoding='utf-8') as f:
+            self.assertTrue(name in f.read())
+
+    def test_gzip(self):
+        path = self.path('cashups.ndjson.gz')
+        export.export(self.company, path)
+        with gzip.open(path) as f:
+            self.assertEqual(len(f.read().splitlines()), 4)
+
+    def test_cashups_are_not_cached(self):
+        export.export(self.company, self.path('cashups.ndjson'))
+        # Only the list of sites.
+        self.assertEqual(len(self.client._cache), 1)
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, export.export, self.company,
+                          self.path('x'), format='xml')
+        self.assertRaises(ValueError, export.export, self.company,
+                          self.path('x'), kind='orders')
@@ -0,0 +1,193 @@
+from unittest import TestCase
+from kounta.client import BasicClient, URLCache
+from kounta.objects import Cashup, Company, Inventory, Site, Staff
+from test.server import json_responses, response
+import gc
+import json
+import pickle
+import threading
+import time
+
+
+class IdentityTestCase(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.responses = {
+            '/v1/companies/5678/sites/1/cashups.json': [
+                {'id': i, 'site': {'id': 1, 'name': 'Sydney'},
+                 'staff_member': {'id': 7, 'first_name': 'Jo'}}
+                for i in range(3)
+            ],
+            '/v1/companies/5678/sites.json': [
+                {'id': 1, 'name': 'Sydney', 'code': 'SYD'},
+            ],
+        }
+        self.client = BasicClient('', '', cache=URLCache(ttl=60))
+        self.client._fetch_url = json_responses(self.responses)
+        self.company = Company({'id': 5678}, self.client, None)
+        self.site = Site({'id': 1}, self.client, self.company)
+
+
+class TestIdentityMap(IdentityTestCase):
+    def test_embedded_entities_are_shared(self):
+        cashups = self.site.cashups()
+        sites = [cashup.site for cashup in cashups]
+        staff = [cashup.staff_member for cashup in cashups]
+        self.assertTrue(sites[0] is sites[1] is sites[2])
+        self.assertTrue(staff[0] is staff[1] is staff[2])
+        self.assertTrue(isinstance(staff[0], Staff))
+        for cashup in cashups:
+            self.assertTrue(cashup.obj['site'] is sites[0].obj)
+
+    def test_fetched_list_completes_embedded_entity(self):
+        site = self.site.cashups()[0].site
+        self.assertEqual(site.obj.get('code'), None)
+        self.assertTrue(self.company.site(1) is site)
+        self.assertEqual(site.code, 'SYD')
+        self.assertTrue(self.company.sites[0] is site)
+
+    def test_cached_responses_show_merged_fields(self):
+        cashup = self.site.cashups()[0]
+        cashup.site
+        self.company.site(1)
+        url = '/v1/companies/5678/sites/1/cashups.json'
+        expected = {'id': 1, 'name': 'Sydney', 'code': 'SYD'}
+        self.assertEqual(self.client.get_url(url)[0]['site'], expected)
+        self.assertEqual(json.loads(str(cashup))['site'], expected)
+
+    def test_lookups_keep_memoized_values(self):
+        self.responses['/v1/companies/5678/sites.json'][0]['created_at'] = \
+            '2013-06-02T14:22:08+10:00'
+        site = self.site.cashups()[0].site
+        self.company.site(1)
+        created_at = site.created_at
+        self.assertTrue(self.company.site(1) is site)
+        self.assertTrue(site.created_at is created_at)
+
+    def test_embedded_copy_does_not_overwrite_fields(self):
+        fetched = self.client._identify(Site, {'id': 2, 'name': 'New'},
+                                        self.company, True)
+        embedded = self.client._identify(Site, {'id': 2, 'name': 'Old',
+                                                'code': 'X'}, self.company)
+        self.assertTrue(fetched is embedded)
+        self.assertEqual(fetched.obj, {'id': 2, 'name': 'New', 'code': 'X'})
+
+    def test_classes_are_kept_apart(self):
+        site = self.client._identify(Site, {'id': 1}, None)
+        staff = self.client._identify(Staff, {'id': 1}, None)
+        self.assertFalse(site is staff)
+
+    def test_inventory_is_not_shared(self):
+        # An inventory's ID is the ID of its product.
+        a = Cashup({'id': 1}, self.client, self.company)._wrap(
+            Inventory, {'id': 8710, 'stock': 1}, self.company)
+        b = Cashup({'id': 2}, self.client, self.company)._wrap(
+            Inventory, {'id': 8710, 'stock': 2}, self.company)
+        self.assertFalse(a is b)
+
+    def test_without_id(self):
+        self.assertFalse(self.client._identify(Site, {}, None) is
+                         self.client._identify(Site, {}, None))
+
+    def test_entities_are_held_weakly(self):
+        self.client._identify(Site, {'id': 3}, None)
+        gc.collect()
+        self.assertFalse((Site, 3) in self.client._identities)
+
+
+class TestHydration(IdentityTestCase):
+    def setUp(self):
+        IdentityTestCase.setUp(self)
+        self.responses['/v1/companies/5678/staff.json'] = [
+            {'id': 7, 'first_name': 'Jo',
+             'primary_email_address': 'jo@example.com'},
+            {'id': 8, 'first_name': 'Al'},
+        ]
+        self.responses['/v1/companies/5678/sites/1/cashups.json'].append(
+            {'id': 3, 'site': {'id': 1}, 'staff_member': {'id': 8}})
+
+    def test_missing_field_is_hydrated(self):
+        staff = self.site.cashups()[0].staff_member
+        self.assertEqual(staff.primary_email_address, 'jo@example.com')
+        self.assertEqual(staff.first_name, 'Jo')
+
+    def test_stubs_are_hydrated_by_one_list_request(self):
+        cashups = self.site.cashups()
+        staff = [cashup.staff_member for cashup in cashups]
+        staff[0].primary_email_address
+        self.assertEqual(staff[-1].first_name, 'Al')
+        self.assertEqual(staff[-1].obj.get('primary_email_address'), None)
+        self.client._fetch_url.assert_any_call(
+            '/v1/companies/5678/staff.json')
+        # The cashups and the staff list.
+        self.assertEqual(self.client._fetch_url.call_count, 2)
+
+    def test_concurrent_reads_wait_for_hydration(self):
+        fetch = self.client._fetch_url
+
+        def slow(url, headers=None):
+            if url.endswith('/staff.json'):
+                time.sleep(0.1)
+            return fetch(url, headers)
+
+        self.client._fetch_url = slow
+        staff = self.site.cashups()[0].staff_member
+        results = []
+
+        def read():
+            try:
+                results.append(staff.primary_email_address)
+            except KeyError as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=read) for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['jo@example.com'] * 2)
+
+    def test_failed_hydration_is_retried(self):
+        staff = self.site.cashups()[0].staff_member
+        fetch = self.client._fetch_url
+        self.client._fetch_url = lambda url, headers=None: response('[')
+        self.assertRaises(ValueError, lambda: staff.primary_email_address)
+        self.client._fetch_url = fetch
+        self.assertEqual(staff.primary_email_address, 'jo@example.com')
+
+    def test_field_missing_from_list_raises_key_error(self):
+        staff = self.site.cashups()[-1].staff_member
+        self.assertRaises(KeyError, lambda: staff.primary_email_address)
+        self.assertRaises(KeyError, lambda: staff.primary_email_address)
+        self.assertEqual(self.client._fetch_url.call_count, 2)
+
+    def test_unknown_entity_raises_key_error(self):
+        staff = self.client._identify(Staff, {'id': 9}, self.company)
+        self.assertRaises(KeyError, lambda: staff.primary_email_address)
+
+    def test_present_fields_make_no_request(self):
+        for cashup in self.site.cashups():
+            cashup.site.name
+            cashup.staff_member.id
+        self.assertEqual(self.client._fetch_url.call_count, 1)
+
+    def test_attribute_access_does_not_hydrate(self):
+        staff = self.site.cashups()[0].staff_member
+        self.assertRaises(KeyError, lambda: staff.nickname)
+        self.assertRaises(KeyError, lambda: staff.primary_email_address_)
+        self.assertEqual(self.client._fetch_url.call_count, 1)
+        self.assertEqual(staff.primary_email_address, 'jo@example.com')
+
+    def test_hydration_can_be_disabled(self):
+        self.client.hydrate = False
+        staff = self.site.cashups()[0].staff_member
+        self.assertRaises(KeyError, lambda: staff.primary_email_address)
+        self.assertEqual(self.client._fetch_url.call_count, 1)
+
+    def test_stub_pickles_as_dict(self):
+        cashup = self.site.cashups()[0]
+        cashup.staff_member
+        obj = pickle.loads(pickle.dumps(cashup.obj))
+        self.assertEqual(type(obj['staff_member']), dict)
+        self.assertEqual(json.loads(str(cashup))['staff_member'],
+                         {'id': 7, 'first_name': 'Jo'})
@@ -0,0 +1,135 @@
+from unittest import TestCase
+from kounta.client import BasicClient, URLCache
+from kounta.objects import (Company, PaymentMethod, Product, Register, Site,
+                            Staff, Tax)
+from kounta.sqlitecache import SQLiteURLCache
+from mock import patch
+from test.server import json_responses
+import os
+import shutil
+import tempfile
+
+
+class TestIndexes(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.responses = {
+            '/v1/companies/5678/sites.json': [{'id': 1, 'name': 'A'},
+                                              {'id': 42, 'name': 'B'}],
+            '/v1/companies/5678/registers.json': [{'id': 7}],
+            '/v1/companies/5678/products.json': [{'id': 8710}],
+            '/v1/companies/5678/payment_methods.json': [{'id': 12}],
+            '/v1/companies/5678/taxes.json': [{'id': 829}],
+            '/v1/companies/5678/staff.json': [{'id': 389427}],
+        }
+        self.client = BasicClient('', '', cache=URLCache(ttl=60))
+        self.client._fetch_url = json_responses(self.responses)
+        self.company = Company({'id': 5678}, self.client, None)
+
+    def test_site(self):
+        site = self.company.site(42)
+        self.assertTrue(isinstance(site, Site))
+        self.assertEqual(site.name, 'B')
+        self.assertEqual(site._company, self.company)
+
+    def test_unknown_id(self):
+        self.assertEqual(self.company.site(3), None)
+
+    def test_lookups_make_one_request_per_list(self):
+        for i in range(10):
+            self.company.site(1)
+            self.company.site(42)
+        self.assertEqual(self.client._fetch_url.call_count, 1)
+
+    def test_index_is_built_once(self):
+        self.company.site(1)
+        index = self.client._indexes['/v1/companies/5678/sites.json'][1]
+        self.company.site(42)
+        self.assertTrue(
+            self.client._indexes['/v1/companies/5678/sites.json'][1] is index)
+
+    def test_every_index(self):
+        self.assertTrue(isinstance(self.company.register(7), Register))
+        self.assertTrue(isinstance(self.company.product(8710), Product))
+        self.assertTrue(isinstance(self.company.payment_method(12),
+                                   PaymentMethod))
+        self.assertTrue(isinstance(self.company.tax(829), Tax))
+        self.assertTrue(isinstance(self.company.staff_member(389427), Staff))
+
+    def test_lists(self):
+        self.assertEqual([p.id for p in self.company.products], [8710])
+        self.assertEqual([m.id for m in self.company.payment_methods], [12])
+        self.assertEqual([t.id for t in self.company.taxes], [829])
+        self.assertEqual([s.id for s in self.company.staff], [389427])
+
+    def test_index_follows_the_cache(self):
+        self.company.site(1)
+        self.responses['/v1/companies/5678/sites.json'] = [{'id': 3}]
+        self.assertEqual(self.company.site(3), None)
+        self.client.invalidate_prefix('/v1/companies/5678/sites')
+        self.assertEqual(self.client._indexes, {})
+        self.assertEqual(self.company.site(3).id, 3)
+        self.assertEqual(self.company.site(1), None)
+
+    def test_reset_cache_drops_indexes(self):
+        self.company.site(1)
+        self.client.reset_cache()
+        self.assertEqual(self.client._indexes, {})
+
+    def test_expired_list_is_reindexed(self):
+        with patch('kounta.client.time') as clock:
+            clock.time.return_value = 1000
+            self.company.site(1)
+            self.responses['/v1/companies/5678/sites.json'] = [{'id': 3}]
+            clock.time.return_value = 1060
+            self.assertEqual(self.company.site(3).id, 3)
+
+    def test_expired_index_is_dropped(self):
+        with patch('kounta.client.time') as clock:
+            clock.time.return_value = 1000
+            self.company.site(1)
+            clock.time.return_value = 1060
+            self.assertEqual(self.client._cached_index(
+                '/v1/companies/5678/sites.json'), None)
+            self.assertEqual(self.client._indexes, {})
+
+    def test_evicted_lists_are_not_kept_by_their_index(self):
+        self.client._cache.max_entries = 1
+        self.company.site(1)
+        self.company.register(7)
+        self.assertEqual(list(self.client._indexes),
+                         ['/v1/companies/5678/registers.json'])
+
+
+class TestPersistentIndexes(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        path = os.path.join(self.directory, 'cache.sqlite')
+        self.client = BasicClient('', '', cache=SQLiteURLCache(path))
+        self.client._fetch_url = json_responses({
+            '/v1/companies/5678/sites.json': [{'id': 1, 'name': 'A'},
+                                              {'id': 42, 'name': 'B'}],
+        })
+        self.company = Company({'id': 5678}, self.client, None)
+
+    def tearDown(self):
+        self.client._cache.close()
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def test_lookups_do_not_decode_the_list(self):
+        self.company.site(1)
+        with patch.object(SQLiteURLCache, '__getitem__') as getitem:
+            self.assertEqual(self.company.site(42).name, 'B')
+            self.assertEqual(self.company.site(3), None)
+        self.assertEqual(getitem.call_count, 0)
+        self.assertEqual(self.client._fetch_url.call_count, 1)
+
+    def test_stored_list_is_reindexed(self):
+        url = '/v1/companies/5678/sites.json'
+        self.company.site(1)
+        # As if another process had refreshed the list.
+        self.client._cache.set(url, [{'id': 3, 'name': 'C'}])
+        self.assertEqual(self.company.site(3).name, 'C')
+        self.assertEqual(self.company.site(1), None)
@@ -0,0 +1,83 @@
+from unittest import TestCase
+from kounta.client import BasicClient
+from kounta.inventory import StockMatrix
+from kounta.objects import Company, Inventory, Site
+from test.server import json_responses
+
+
+class TestStockMatrix(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.matrix = StockMatrix({
+            1: [{'id': 829, 'stock': 12}, {'id': 830, 'stock': 2.5}],
+            2: [{'id': 829, 'stock': 3}, {'id': 831, 'stock': None}],
+            3: [],
+        })
+
+    def test_ids(self):
+        self.assertEqual(self.matrix.product_ids, [829, 830, 831])
+        self.assertEqual(self.matrix.site_ids, [1, 2, 3])
+        self.assertEqual(len(self.matrix), 3)
+
+    def test_stock(self):
+        self.assertEqual(self.matrix.stock(829, 1), 12)
+        self.assertEqual(self.matrix[829, 2], 3)
+        self.assertEqual(self.matrix[830, 1], 2.5)
+
+    def test_stock_that_was_not_reported(self):
+        self.assertEqual(self.matrix[830, 2], None)
+        self.assertEqual(self.matrix[831, 2], None)
+        self.assertEqual(self.matrix[829, 3], None)
+
+    def test_unknown_ids(self):
+        self.assertEqual(self.matrix[1, 1], None)
+        self.assertEqual(self.matrix[829, 99], None)
+        self.assertEqual(self.matrix.product(1), {})
+        self.assertEqual(self.matrix.site(99), {})
+
+    def test_product(self):
+        self.assertEqual(self.matrix.product(829), {1: 12, 2: 3})
+        self.assertEqual(self.matrix.total(829), 15)
+
+    def test_site(self):
+        self.assertEqual(self.matrix.site(1), {829: 12, 830: 2.5})
+
+    def test_empty(self):
+        matrix = StockMatrix({})
+        self.assertEqual(len(matrix), 0)
+        self.assertEqual(matrix[1, 1], None)
+
+
+class TestInventoryEndpoints(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.responses = {
+            '/v1/companies/5678/sites.json': [{'id': 1}, {'id': 2}],
+            '/v1/companies/5678/sites/1/inventory.json': [
+                {'id': 829, 'stock': 12}],
+            '/v1/companies/5678/sites/2/inventory.json': [
+                {'id': 829, 'stock': 3}, {'id': 830, 'stock': 1}],
+        }
+        self.client = BasicClient('', '')
+        self.client._fetch_url = json_responses(self.responses)
+        self.company = Company({'id': 5678}, self.client, None)
+
+    def test_site_inventory(self):
+        site = Site({'id': 2}, self.client, self.company)
+        inventory = site.inventory
+        self.assertTrue(isinstance(inventory[0], Inventory))
+        self.assertEqual([(i.id, i.stock) for i in inventory],
+                         [(829, 3), (830, 1)])
+
+    def test_company_stock_levels(self):
+        matrix = self.company.stock_levels(max_workers=2)
+        self.assertTrue(isinstance(matrix, StockMatrix))
+        self.assertEqual(matrix.product(829), {1: 12, 2: 3})
+        self.assertEqual(matrix[830, 1], None)
+        self.assertEqual(self.client._fetch_url.call_count, 3)
+
+    def test_company_stock_levels_is_cached(self):
+        self.company.stock_levels()
+        site = Site({'id': 1}, self.client, self.company)
+        self.assertEqual(site.inventory[0].stock, 12)
+        self.assertEqual(self.client._fetch_url.call_count, 3)
@@ -0,0 +1,46 @@
+from unittest import TestCase
+from dateutil import parser
+from kounta.iso8601 import parse
+from mock import patch
+
+
+class TestParse(TestCase):
+    def assertParsesLikeDateutil(self, value):
+        expected = parser.parse(value)
+        actual = parse(value)
+        self.assertEqual(actual, expected)
+        self.assertEqual(actual.utcoffset(), expected.utcoffset())
+        self.assertEqual(str(actual), str(expected))
+
+    def test_api_format(self):
+        self.assertParsesLikeDateutil('2013-06-02T14:22:08+10:00')
+
+    def test_negative_offset(self):
+        self.assertParsesLikeDateutil('2013-06-02T14:22:08-03:30')
+
+    def test_utc(self):
+        self.assertParsesLikeDateutil('2013-06-02T14:22:08Z')
+        self.assertParsesLikeDateutil('2013-06-02T14:22:08+00:00')
+
+    def test_offset_without_colon(self):
+        self.assertParsesLikeDateutil('2013-06-02T14:22:08+1000')
+
+    def test_fraction(self):
+        self.assertParsesLikeDateutil('2013-06-02T14:22:08.5+10:00')
+        self.assertParsesLikeDateutil('2013-06-02T14:22:08.123456Z')
+
+    def test_naive(self):
+        self.assertParsesLikeDateutil('2013-06-02 14:22:08')
+
+    def test_fast_path_does_not_use_dateutil(self):
+        with patch('kounta.iso8601._dateutil_parse') as fallback:
+            parse('2013-06-02T14:22:08+10:00')
+        self.assertFalse(fallback.called)
+
+    def test_other_formats_fall_back_to_dateutil(self):
+        self.assertParsesLikeDateutil('2013-06-02')
+        self.assertParsesLikeDateutil('June 2 2013 2:22pm')
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, parse, '2013-02-30T14:22:08Z')
+        self.assertRaises(ValueError, parse, 'foo')
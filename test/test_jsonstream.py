@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+from unittest import TestCase
+from kounta import jsonstream
+import json
+
+
+def split(text, size):
+    data = text.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestDecode(TestCase):
+    document = (' [{"id": 1, "name": "café \\"A\\""}, 12345, -1.5e3, '
+                'true, null, "a,]b", [1, [2]], {"k": {"v": []}}] ')
+
+    def test_decode_in_every_chunk_size(self):
+        expected = json.loads(self.document)
+        for size in range(1, 20):
+            self.assertEqual(jsonstream.decode(split(self.document, size)),
+                             expected)
+
+    def test_numbers_split_across_chunks(self):
+        self.assertEqual(jsonstream.decode([b'[12', b'34', b']']), [1234])
+
+    def test_decode_object(self):
+        self.assertEqual(jsonstream.decode(split('{"a": [1, 2]}', 3)),
+                         {'a': [1, 2]})
+
+    def test_decode_empty_array(self):
+        self.assertEqual(jsonstream.decode([b' [', b' ] ']), [])
+
+    def test_decode_text_chunks(self):
+        self.assertEqual(jsonstream.decode(['[1,', '2]']), [1, 2])
+
+    def test_decode_nothing(self):
+        self.assertRaises(ValueError, jsonstream.decode, [b'  '])
+
+    def test_unterminated_array(self):
+        self.assertRaises(ValueError, jsonstream.decode, [b'[1, 2'])
+
+    def test_trailing_comma(self):
+        self.assertRaises(ValueError, jsonstream.decode, [b'[1, ]'])
+
+    def test_invalid_item(self):
+        self.assertRaises(ValueError, jsonstream.decode, [b'[1, foo]'])
+
+    def test_extra_data(self):
+        self.assertRaises(ValueError, jsonstream.decode, [b'[1] 2'])
+
+
+class TestIterArray(TestCase):
+    def test_items_are_yielded_before_the_end(self):
+        def chunks():
+            yield b'[{"id": 1}, '
+            yield b'{"id": 2}, '
+            raise AssertionError('read too far')
+
+        items = jsonstream.iter_array(chunks())
+        self.assertEqual(next(items), {'id': 1})
+
+    def test_not_an_array(self):
+        self.assertRaises(ValueError, list, jsonstream.iter_array([b'{}']))
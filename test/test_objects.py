@@ -1,6 +1,7 @@
 from unittest import TestCase
 from kounta.objects import *
 from kounta.client import BasicClient
+from dateutil.parser import parse
 from mock import MagicMock
 import json
 import datetime
@@ -25,6 +26,29 @@ class TestBaseObject(BaseObjectTestCase):
         self.assertEqual(address.foo, "bar")
 
 
+class TestSlots(BaseObjectTestCase):
+    def test_objects_have_no_dict(self):
+        company = self.get_company()
+        self.assertFalse(hasattr(company, '__dict__'))
+        self.assertRaises(AttributeError, setattr, company, 'foo', 1)
+
+    def test_every_class_is_slotted(self):
+        import kounta.objects
+        for value in vars(kounta.objects).values():
+            if isinstance(value, type) and issubclass(value, BaseObject):
+                self.assertTrue('__slots__' in vars(value), value.__name__)
+
+    def test_empty_slots_do_not_recurse(self):
+        empty = Cashup.__new__(Cashup)
+        self.assertRaises(AttributeError, getattr, empty, 'obj')
+        self.assertRaises(AttributeError, getattr, empty, 'id')
+
+    def test_copy(self):
+        import copy
+        company = self.get_company()
+        self.assertEqual(copy.copy(company).id, company.id)
+
+
 class TestAddress(BaseObjectTestCase):
     def setUp(self):
         BaseObjectTestCase.setUp(self)
@@ -90,6 +114,10 @@ class TestCompany(BaseObjectTestCase):
     def test_currency(self):
         self.assertEqual(self.company.currency, "AUD")
 
+    def test_nested_objects_belong_to_the_company(self):
+        self.assertTrue(self.company.timezone._company is self.company)
+        self.assertTrue(self.company.timezone is self.company.timezone)
+
     def test_timezone(self):
         timezone = self.company.timezone
         self.assertTrue(isinstance(timezone, Timezone))
@@ -326,6 +354,17 @@ class TestOrder(BaseObjectTestCase):
         self.assertEqual(self.order.updated_at,
                          parse("2013-06-02T14:22:08+10:00"))
 
+    def test_timestamps_are_parsed_once(self):
+        self.assertTrue(self.order.created_at is self.order.created_at)
+
+    def test_lines(self):
+        self.assertTrue(isinstance(self.order.lines[0], Line))
+        self.assertEqual(self.order.lines[0].product_id, 8710)
+
+    def test_payments(self):
+        self.assertTrue(isinstance(self.order.payments[0], Payment))
+        self.assertEqual(self.order.payments[0].amount, 14.25)
+
 
 class TestPaymentMethod(BaseObjectTestCase):
     def setUp(self):
@@ -741,6 +780,23 @@ class TestCashup(BaseObjectTestCase):
     def test_id(self):
         self.assertEqual(self.cashup.id, 19762)
 
+    def test_children_are_built_once(self):
+        self.assertTrue(self.cashup.site is self.cashup.site)
+        reconciliations = self.cashup.reconciliations
+        self.assertTrue(reconciliations is self.cashup.reconciliations)
+        self.assertTrue(reconciliations[0].takings is
+                        self.cashup.reconciliations[0].takings)
+
+    def test_replacing_obj_drops_children(self):
+        site = self.cashup.site
+        created_at = self.cashup.created_at
+        obj = dict(self.cashup.obj, site={'id': 1},
+                   created_at='2014-01-01T00:00:00+10:00')
+        self.cashup.obj = obj
+        self.assertEqual(self.cashup.site.id, 1)
+        self.assertFalse(self.cashup.site is site)
+        self.assertNotEqual(self.cashup.created_at, created_at)
+
     def test_(self):
         self.assertEqual(self.cashup.number, 27)
 
@@ -0,0 +1,131 @@
+from unittest import TestCase
+from datetime import date, datetime, timedelta
+from kounta.client import BasicClient
+from kounta.objects import Company, Order, Site
+from kounta.order import OrderUrlGenerator
+from kounta.transport import ConnectionPool
+from test.server import StandInServer
+import threading
+import time
+
+
+class TestOrderUrlGenerator(TestCase):
+    def test_no_filter(self):
+        generator = OrderUrlGenerator()
+        self.assertEqual(generator.get_url(), 'orders.json')
+
+    def test_since_until(self):
+        generator = OrderUrlGenerator()
+        self.assertEqual(generator.get_url(since='2013-04-29',
+                                           until=date(2013, 5, 1)),
+                         'orders.json?created_gte=2013-04-29T00%3A00%3A00&'
+                         'created_lt=2013-05-01T00%3A00%3A00')
+
+    def test_invalid_type(self):
+        generator = OrderUrlGenerator()
+        self.assertRaises(ValueError, generator.get_url, since={})
+
+    def test_windows(self):
+        generator = OrderUrlGenerator()
+        urls = generator.get_urls('2013-04-01', '2013-04-20',
+                                  timedelta(days=7))
+        self.assertEqual(urls, [
+            generator.get_url(since='2013-04-01', until='2013-04-08'),
+            generator.get_url(since='2013-04-08', until='2013-04-15'),
+            generator.get_url(since='2013-04-15', until='2013-04-20'),
+        ])
+
+    def test_until_defaults_to_now(self):
+        generator = OrderUrlGenerator()
+        since = datetime.now() - timedelta(hours=30)
+        self.assertEqual(len(generator.get_urls(since,
+                                                window=timedelta(days=1))), 2)
+
+    def test_naive_and_aware_bounds(self):
+        generator = OrderUrlGenerator()
+        urls = generator.get_urls(date(2015, 1, 30),
+                                  '2015-02-01T00:00:00+10:00')
+        self.assertEqual(urls, [
+            generator.get_url(since='2015-01-30T00:00:00+10:00',
+                              until='2015-02-01T00:00:00+10:00'),
+        ])
+        urls = generator.get_urls('2015-01-30T00:00:00+10:00',
+                                  datetime(2015, 2, 1))
+        self.assertEqual(len(urls), 1)
+
+    def test_empty_range(self):
+        generator = OrderUrlGenerator()
+        self.assertEqual(generator.get_urls('2013-04-02', '2013-04-01'), [])
+
+    def test_window_must_be_positive(self):
+        generator = OrderUrlGenerator()
+        self.assertRaises(ValueError, generator.get_urls, '2013-04-01',
+                          '2013-04-02', timedelta(0))
+
+
+class TestOrders(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        generator = OrderUrlGenerator()
+        self.urls = generator.get_urls('2013-04-01', '2013-04-29',
+                                       timedelta(days=7))
+        routes = {}
+        for i, url in enumerate(self.urls):
+            routes['/v1/companies/5678/sites/1/' + url] = \
+                (200, {}, '[{"id": %d}, {"id": %d}]' % (2 * i, 2 * i + 1))
+            routes['/v1/companies/5678/' + url] = (200, {}, '[{"id": %d}]' % i)
+        self.server = StandInServer(routes)
+        pool = ConnectionPool('127.0.0.1', self.server.port, secure=False)
+        self.client = BasicClient('id', 'secret', pool=pool)
+        self.company = Company({'id': 5678}, self.client, None)
+        self.site = Site({'id': 1}, self.client, self.company)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        TestCase.tearDown(self)
+
+    def test_site_orders_are_merged_in_order(self):
+        orders = list(self.site.orders('2013-04-01', '2013-04-29',
+                                       max_workers=3))
+        self.assertTrue(isinstance(orders[0], Order))
+        self.assertEqual([order.id for order in orders], list(range(8)))
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_company_orders(self):
+        orders = self.company.orders('2013-04-01', '2013-04-29')
+        self.assertEqual([order.id for order in orders], [0, 1, 2, 3])
+
+    def test_company_orders_belong_to_the_company(self):
+        orders = self.company.orders('2013-04-01', '2013-04-29')
+        self.assertTrue(next(orders)._company is self.company)
+        orders.close()
+
+    def test_orders_are_not_cached(self):
+        list(self.company.orders('2013-04-01', '2013-04-29'))
+        self.assertEqual(len(self.client._cache), 0)
+
+    def test_windows_are_fetched_concurrently(self):
+        active = [0, 0]
+        lock = threading.Lock()
+
+        def slow(handler):
+            with lock:
+                active[0] += 1
+                active[1] = max(active)
+            time.sleep(0.1)
+            with lock:
+                active[0] -= 1
+            return 200, {}, '[]'
+
+        for url in self.urls:
+            self.server.routes['/v1/companies/5678/' + url] = slow
+        list(self.company.orders('2013-04-01', '2013-04-29', max_workers=4))
+        self.assertTrue(active[1] > 1)
+
+    def test_fetches_at_most_max_workers_ahead(self):
+        orders = self.site.orders('2013-04-01', '2013-04-29', max_workers=2)
+        next(orders)
+        time.sleep(0.1)
+        self.assertTrue(len(self.server.requests) <= 3)
+        orders.close()
@@ -0,0 +1,284 @@
+from unittest import TestCase
+from kounta.client import BasicClient, URLCache
+from kounta.objects import Company, Site
+from kounta.transport import ConnectionPool, Response
+from mock import MagicMock
+from test.server import StandInServer
+import threading
+import time
+
+try:
+    import urllib.request as urllib2
+except ImportError:
+    import urllib2
+
+
+class PagedTestCase(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        base = '/v1/companies/5678/sites.json'
+        self.server = StandInServer({
+            base: (200, {'X-Next-Page': base + '?page=2', 'ETag': '"p1"'},
+                   '[{"id": 1}, {"id": 2}]'),
+            base + '?page=2': (
+                200, {'Link': '<https://api.kounta.com%s?page=3>; rel="next"'
+                              % base},
+                '[{"id": 3}, {"id": 4}]'),
+            base + '?page=3': (200, {}, '[{"id": 5}]'),
+        })
+        pool = ConnectionPool('127.0.0.1', self.server.port, secure=False)
+        self.client = BasicClient('id', 'secret', pool=pool)
+        self.company = Company({'id': 5678}, self.client, None)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        TestCase.tearDown(self)
+
+    def paths(self):
+        return [path for path, headers in self.server.requests]
+
+
+class TestPagination(PagedTestCase):
+
+    def test_get_url_follows_every_page(self):
+        sites = self.company.sites
+        self.assertEqual([site.id for site in sites], [1, 2, 3, 4, 5])
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_paged_list_is_cached_under_the_first_url(self):
+        url = '/v1/companies/5678/sites.json'
+        self.client.get_url(url)
+        self.assertEqual(len(self.client.get_url(url)), 5)
+        self.assertEqual(self.client._cache.stale(url), None)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_expired_paged_list_sees_changes_to_later_pages(self):
+        url = '/v1/companies/5678/sites.json'
+        page = self.server.routes[url]
+        self.server.routes[url] = lambda request: (
+            (304, {}, '') if request.headers.get('If-None-Match') == '"p1"'
+            else page)
+        self.client._cache = URLCache(ttl=0.05)
+        self.client.get_url(url)
+        self.server.routes[url + '?page=3'] = (200, {},
+                                               '[{"id": 5}, {"id": 6}]')
+        time.sleep(0.1)
+        self.assertEqual([site['id'] for site in self.client.get_url(url)],
+                         [1, 2, 3, 4, 5, 6])
+
+    def test_iter_pages(self):
+        pages = list(self.client.iter_pages('/v1/companies/5678/sites.json'))
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+
+    def test_iter_url_fetches_pages_lazily(self):
+        items = self.client.iter_url('/v1/companies/5678/sites.json')
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(next(items), {'id': 1})
+        self.assertEqual(next(items), {'id': 2})
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(next(items), {'id': 3})
+        self.assertEqual(self.paths()[-1],
+                         '/v1/companies/5678/sites.json?page=2')
+
+    def test_limit_stops_fetching(self):
+        sites = list(self.company.iter_sites(limit=3))
+        self.assertEqual([site.id for site in sites], [1, 2, 3])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_limit_zero(self):
+        self.assertEqual(list(self.company.iter_sites(limit=0)), [])
+        self.assertEqual(self.server.requests, [])
+
+    def test_iterated_objects_are_wrapped(self):
+        sites = list(self.company.iter_sites())
+        self.assertEqual(len(sites), 5)
+        self.assertTrue(isinstance(sites[0], Site))
+        self.assertEqual(sites[0]._company, self.company)
+
+    def test_pages_are_not_cached(self):
+        list(self.company.iter_sites())
+        self.assertEqual(len(self.client._cache), 0)
+
+    def test_iter_cashups_uses_filters(self):
+        self.server.routes['/v1/companies/5678/cashups/unprocessed.json'] = (
+            200, {}, '[{"id": 7}]')
+        cashups = list(self.company.iter_cashups(unprocessed=True))
+        self.assertEqual([cashup.id for cashup in cashups], [7])
+
+
+class TestReadAhead(PagedTestCase):
+    def wait_for_requests(self, count):
+        deadline = time.time() + 5
+        while len(self.server.requests) < count and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_next_page_is_fetched_while_the_current_one_is_processed(self):
+        pages = self.client.iter_pages('/v1/companies/5678/sites.json',
+                                       read_ahead=1)
+        self.assertEqual(len(next(pages)), 2)
+        self.wait_for_requests(2)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual([len(page) for page in pages], [2, 1])
+
+    def test_depth_bounds_pages_in_flight(self):
+        pages = self.client.iter_pages('/v1/companies/5678/sites.json',
+                                       read_ahead=1)
+        next(pages)
+        time.sleep(0.2)
+        # The page handed out and the one waiting in the queue.
+        self.assertEqual(len(self.server.requests), 2)
+        next(pages)
+        self.wait_for_requests(3)
+        self.assertEqual(len(self.server.requests), 3)
+        pages.close()
+
+    def test_objects_with_read_ahead(self):
+        sites = list(self.company.iter_sites(read_ahead=2))
+        self.assertEqual([site.id for site in sites], [1, 2, 3, 4, 5])
+
+    def test_errors_are_raised_in_the_consumer(self):
+        del self.server.routes['/v1/companies/5678/sites.json?page=2']
+        pages = self.client.iter_pages('/v1/companies/5678/sites.json',
+                                       read_ahead=1)
+        next(pages)
+        self.assertRaises(urllib2.HTTPError, next, pages)
+
+    def test_stopping_early_ends_the_thread(self):
+        def readers():
+            return [thread for thread in threading.enumerate()
+                    if thread.name == 'kounta-read-ahead']
+
+        sites = self.company.iter_sites(limit=1, read_ahead=1)
+        self.assertEqual(len(list(sites)), 1)
+        deadline = time.time() + 5
+        while readers() and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(readers(), [])
+
+
+class ChunkedResponse(Response):
+    """
+    A response whose body is handed out in the given chunks, recording how
+    many have been read.
+    """
+
+    def __init__(self, chunks, headers=None):
+        Response.__init__(self, 200, 'OK', headers or {}, None)
+        self.chunks = chunks
+        self.read_chunks = 0
+        self.closed = False
+
+    def iter_chunks(self):
+        for chunk in self.chunks:
+            self.read_chunks += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class TestStreaming(PagedTestCase):
+    def test_items_are_yielded_before_the_response_is_complete(self):
+        body = ChunkedResponse([b'[{"id": 1},', b' {"id": 2}', b']'])
+        self.client._fetch_url = MagicMock(return_value=body)
+        cashups = self.company.iter_cashups(stream=True)
+        self.assertEqual(next(cashups).id, 1)
+        self.assertEqual(body.read_chunks, 1)
+        self.assertEqual([cashup.id for cashup in cashups], [2])
+
+    def test_stream_follows_pages(self):
+        sites = self.client.iter_url('/v1/companies/5678/sites.json',
+                                     stream=True)
+        self.assertEqual([site['id'] for site in sites], [1, 2, 3, 4, 5])
+        self.assertEqual(len(self.client._cache), 0)
+
+    def test_stopping_early_closes_the_response(self):
+        body = ChunkedResponse([b'[1,', b' 2,', b' 3]'],
+                               {'x-next-page': '/more.json'})
+        self.client._fetch_url = MagicMock(return_value=body)
+        items = self.client.iter_url('/v1/companies/5678/sites.json',
+                                     limit=1, stream=True)
+        self.assertEqual(list(items), [1])
+        self.assertTrue(body.closed)
+        self.client._fetch_url.assert_called_once_with(
+            '/v1/companies/5678/sites.json')
+
+    def streamed_cashups(self, embedded):
+        return (200, {}, '[%s]' % ', '.join(
+            ['{"id": %d, "%s": {"id": 7}}' % (i, embedded)
+             for i in range(20000)]))
+
+    def test_hydrating_while_streaming_uses_the_reserved_connection(self):
+        self.server.routes['/v1/companies/5678/cashups.json'] = \
+            self.streamed_cashups('staff_member')
+        self.server.routes['/v1/companies/5678/staff.json'] = (
+            200, {}, '[{"id": 7, "phone": "123"}]')
+        pool = ConnectionPool('127.0.0.1', self.server.port, secure=False,
+                              max_size=1)
+        client = BasicClient('id', 'secret', pool=pool)
+        company = Company({'id': 5678}, client, None)
+        cashups = company.iter_cashups(stream=True)
+        staff = next(cashups).staff_member
+        self.assertEqual(staff.phone, '123')
+        self.assertEqual(pool._reserved, None)
+        cashups.close()
+        client.close()
+
+    def test_hydrating_while_every_thread_streams(self):
+        def slow(response):
+            def route(handler):
+                time.sleep(0.1)
+                return response
+            return route
+
+        self.server.routes.update({
+            '/v1/companies/5678/sites/1/cashups.json':
+                self.streamed_cashups('staff_member'),
+            '/v1/companies/5678/sites/2/cashups.json':
+                self.streamed_cashups('register'),
+            '/v1/companies/5678/staff.json':
+                slow((200, {}, '[{"id": 7, "phone": "123"}]')),
+            '/v1/companies/5678/registers.json':
+                slow((200, {}, '[{"id": 7, "name": "Bar"}]')),
+        })
+        pool = ConnectionPool('127.0.0.1', self.server.port, secure=False,
+                              max_size=2)
+        client = BasicClient('id', 'secret', pool=pool)
+        company = Company({'id': 5678}, client, None)
+        results = []
+
+        def read(site_id, embedded, field):
+            site = Site({'id': site_id}, client, company)
+            cashups = site.iter_cashups(stream=True)
+            cashup = next(cashups)
+            # Wait until both threads hold a connection.
+            while pool._open < 2:
+                time.sleep(0.01)
+            results.append(getattr(getattr(cashup, embedded), field))
+            cashups.close()
+
+        threads = [
+            threading.Thread(target=read, args=(1, 'staff_member', 'phone')),
+            threading.Thread(target=read, args=(2, 'register', 'name')),
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        client.close()
+        self.assertEqual(sorted(results), ['123', 'Bar'])
+
+    def test_abandoned_stream_does_not_leak_connections(self):
+        self.server.routes['/v1/companies/5678/sites/1/checkins.json'] = (
+            200, {}, '[%s]' % ', '.join(['{"id": %d}' % i
+                                         for i in range(20000)]))
+        site = Site({'id': 1}, self.client, self.company)
+        checkins = site.iter_checkins(limit=2, stream=True)
+        self.assertEqual([checkin.id for checkin in checkins], [0, 1])
+        self.assertEqual(self.client._pool._open, 0)
+
+    def test_stream_cannot_read_ahead(self):
+        self.assertRaises(ValueError, self.client.iter_url, '/a.json',
+                          read_ahead=1, stream=True)
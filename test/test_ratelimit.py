@@ -0,0 +1,169 @@
+from unittest import TestCase
+from kounta import ratelimit
+from kounta.client import BasicClient
+from kounta.ratelimit import TokenBucket
+from kounta.transport import ConnectionPool
+from mock import patch
+from test.server import StandInServer
+
+try:
+    import urllib.request as urllib2
+except ImportError:
+    import urllib2
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.clock = FakeClock()
+        self.patch = patch('kounta.ratelimit.time', self.clock)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        TestCase.tearDown(self)
+
+    def test_burst_does_not_wait(self):
+        bucket = TokenBucket(rate=2, capacity=3)
+        for i in range(3):
+            self.assertEqual(bucket.acquire(), 0)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_sustained_rate(self):
+        bucket = TokenBucket(rate=4, capacity=1)
+        for i in range(9):
+            bucket.acquire()
+        self.assertAlmostEqual(self.clock.now - 1000, 2.0)
+
+    def test_unlimited(self):
+        bucket = TokenBucket()
+        for i in range(100):
+            bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_pause(self):
+        bucket = TokenBucket()
+        bucket.pause(5)
+        self.assertEqual(bucket.acquire(), 5)
+
+    def test_shorter_pause_does_not_cut_longer_one(self):
+        bucket = TokenBucket(rate=10)
+        bucket.pause(5)
+        bucket.pause(1)
+        bucket.acquire()
+        self.assertTrue(self.clock.now - 1000 >= 5)
+
+
+class TestHelpers(TestCase):
+    def test_shared_bucket(self):
+        a = ratelimit.shared_bucket('test-shared', 5)
+        self.assertTrue(ratelimit.shared_bucket('test-shared', 5) is a)
+        self.assertTrue(ratelimit.shared_bucket('test-shared', 5, 5) is a)
+        self.assertFalse(ratelimit.shared_bucket('test-other') is a)
+
+    def test_unlimited_shared_bucket_takes_the_first_limit(self):
+        a = ratelimit.shared_bucket('test-unlimited')
+        self.assertTrue(ratelimit.shared_bucket('test-unlimited', 2) is a)
+        self.assertEqual((a.rate, a.capacity), (2, 2))
+        self.assertRaises(ValueError, ratelimit.shared_bucket,
+                          'test-unlimited', 3)
+
+    def test_no_limit_joins_the_shared_bucket(self):
+        a = ratelimit.shared_bucket('test-join', 2, 10)
+        self.assertTrue(ratelimit.shared_bucket('test-join') is a)
+        self.assertEqual((a.rate, a.capacity), (2, 10))
+
+    def test_conflicting_shared_bucket(self):
+        ratelimit.shared_bucket('test-conflict', 2)
+        self.assertRaises(ValueError, ratelimit.shared_bucket,
+                          'test-conflict', 3)
+        self.assertRaises(ValueError, ratelimit.shared_bucket,
+                          'test-conflict', 2, 10)
+        self.assertRaises(ValueError, ratelimit.shared_bucket,
+                          'test-conflict', None, 10)
+
+    def test_client_without_limit_joins_the_shared_bucket(self):
+        a = BasicClient('test-clients', '', rate_limit=5)
+        b = BasicClient('test-clients', '')
+        self.assertTrue(b._bucket is a._bucket)
+        self.assertRaises(ValueError, BasicClient, 'test-clients', '',
+                          rate_limit=2)
+        a.close()
+        b.close()
+
+    def test_retry_after_seconds(self):
+        self.assertEqual(ratelimit.retry_after('3'), 3)
+        self.assertEqual(ratelimit.retry_after(None), None)
+        self.assertEqual(ratelimit.retry_after('soon'), None)
+
+    def test_retry_after_date(self):
+        self.assertEqual(
+            ratelimit.retry_after('Fri, 31 Dec 1999 23:59:59 GMT'), 0)
+
+    def test_backoff_is_jittered_and_capped(self):
+        delays = [ratelimit.backoff(10, base=1, maximum=8) for i in range(50)]
+        self.assertTrue(all(0 <= d <= 8 for d in delays))
+        self.assertTrue(len(set(delays)) > 1)
+
+
+class TestThrottledClient(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.attempts = 0
+        self.server = StandInServer({'/limited.json': self.limited})
+        pool = ConnectionPool('127.0.0.1', self.server.port, secure=False)
+        self.bucket = TokenBucket()
+        self.client = BasicClient('', '', pool=pool, bucket=self.bucket)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        TestCase.tearDown(self)
+
+    def limited(self, request):
+        self.attempts += 1
+        if self.attempts < 3:
+            return 429, {'Retry-After': '0.01'}, '{}'
+        return 200, {}, '[1]'
+
+    def test_retries_after_429(self):
+        self.assertEqual(self.client.get_url('/limited.json'), [1])
+        self.assertEqual(self.attempts, 3)
+        self.assertEqual(self.client.throttled, 2)
+
+    def test_gives_up_after_max_retries(self):
+        self.client.max_retries = 1
+        self.assertRaises(urllib2.HTTPError, self.client.get_url,
+                          '/limited.json')
+        self.assertEqual(self.attempts, 2)
+
+    def test_backoff_without_retry_after(self):
+        self.server.routes['/limited.json'] = (503, {}, '{}')
+        self.client.max_retries = 2
+        with patch('kounta.client.ratelimit.backoff',
+                   return_value=0.01) as backoff:
+            self.assertRaises(urllib2.HTTPError, self.client.get_url,
+                              '/limited.json')
+        self.assertEqual([c[0][0] for c in backoff.call_args_list], [0, 1])
+
+    def test_throttling_pauses_the_shared_bucket(self):
+        self.server.routes['/limited.json'] = (429, {'Retry-After': '30'},
+                                               '{}')
+        self.client.max_retries = 1
+        with patch.object(self.bucket, 'pause') as pause:
+            self.assertRaises(urllib2.HTTPError, self.client.get_url,
+                              '/limited.json')
+        pause.assert_called_once_with(30.0)
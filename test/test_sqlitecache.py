@@ -0,0 +1,117 @@
+from unittest import TestCase
+from kounta.client import BasicClient
+from kounta.sqlitecache import SQLiteURLCache
+from mock import MagicMock, patch
+from test.server import response
+import os
+import shutil
+import tempfile
+import threading
+
+
+class TestSQLiteURLCache(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite')
+        self.cache = SQLiteURLCache(self.path)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def test_fetching_a_cache_item_that_doesnt_exist_returns_none(self):
+        self.assertEqual(self.cache['foo'], None)
+
+    def test_setting_an_item_can_be_retrieved(self):
+        self.cache['foo'] = {'bar': [1, 2.5, None]}
+        self.assertEqual(self.cache['foo'], {'bar': [1, 2.5, None]})
+
+    def test_survives_a_restart(self):
+        self.cache['foo'] = 'bar'
+        self.cache.close()
+        cache = SQLiteURLCache(self.path)
+        self.assertEqual(cache['foo'], 'bar')
+        cache.close()
+
+    def test_shared_between_threads(self):
+        def store(i):
+            self.cache['/%d.json' % i] = i
+        threads = [threading.Thread(target=store, args=(i,))
+                   for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.cache), 5)
+
+    def test_delete(self):
+        self.cache['foo'] = 'bar'
+        del self.cache['foo']
+        self.assertFalse('foo' in self.cache)
+
+    def test_ttl(self):
+        cache = SQLiteURLCache(self.path, ttl=60)
+        with patch('kounta.sqlitecache.time') as clock:
+            clock.time.return_value = 1000
+            cache['a'] = 1
+            clock.time.return_value = 1060
+            self.assertEqual(cache['a'], None)
+            self.assertEqual(cache.purge(), 1)
+        self.assertEqual(cache.expirations, 1)
+        cache.close()
+
+    def test_invalidate_prefix(self):
+        for url in ['/v1/companies/1/sites/4/cashups.json',
+                    '/v1/companies/1/sites/4/categories.json',
+                    '/v1/companies/1/sites/42/categories.json',
+                    '/v1/companies/1/sites.json']:
+            self.cache[url] = []
+        self.assertEqual(
+            self.cache.invalidate_prefix('/v1/companies/1/sites/4/'), 2)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_touching_a_missing_entry_is_not_a_revalidation(self):
+        self.cache.touch('foo')
+        self.assertEqual(self.cache.revalidations, 0)
+        self.cache['foo'] = 'bar'
+        self.cache.touch('foo')
+        self.assertEqual(self.cache.revalidations, 1)
+
+    def test_stats(self):
+        self.cache.set('a', 1, 100)
+        # noinspection PyStatementEffect
+        self.cache['a']
+        # noinspection PyStatementEffect
+        self.cache['b']
+        stats = self.cache.stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['bytes'], 100)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertFalse('evictions' in stats)
+
+    def test_warm_client_makes_no_requests(self):
+        client = BasicClient('', '', cache=self.cache)
+        client._fetch_url = MagicMock(return_value=response('{"id":5678}'))
+        self.assertEqual(client.company.id, 5678)
+
+        warm = BasicClient('', '', cache=SQLiteURLCache(self.path))
+        warm._fetch_url = MagicMock()
+        self.assertEqual(warm.company.id, 5678)
+        self.assertFalse(warm._fetch_url.called)
+
+    def test_stale_entries_with_validators(self):
+        cache = SQLiteURLCache(self.path, ttl=60)
+        with patch('kounta.sqlitecache.time') as clock:
+            clock.time.return_value = 1000
+            cache.set('a', 1, etag='"x"')
+            cache.set('b', 2)
+            clock.time.return_value = 1060
+            self.assertEqual(cache['a'], None)
+            self.assertEqual(cache.stale('a'), (1, '"x"', None))
+            self.assertEqual(cache.stale('b'), None)
+            cache.touch('a')
+            self.assertEqual(cache['a'], 1)
+        cache.close()
@@ -0,0 +1,144 @@
+from unittest import TestCase
+from kounta.client import BasicClient
+from kounta.objects import Company, Register, Site, Staff
+from kounta.sync import CashupSync
+from kounta.transport import ConnectionPool
+from test.server import StandInServer
+import json
+import os
+import shelve
+import shutil
+import tempfile
+
+try:
+    import urllib.request as urllib2
+except ImportError:
+    import urllib2
+
+
+def cashups(*cashups):
+    return 200, {}, json.dumps([{'id': id, 'created_at': created_at}
+                                for id, created_at in cashups])
+
+
+class TestCashupSync(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'marks.json')
+        base = '/v1/companies/5678/'
+        self.server = StandInServer({
+            base + 'cashups.json': cashups(
+                (1, '2013-04-28T20:00:00+10:00'),
+                (2, '2013-04-29T20:00:00+10:00')),
+            base + 'cashups/unprocessed.json': cashups(
+                (3, '2013-04-29T21:00:00+10:00')),
+            base + 'cashups/since/2013-04-29.json': cashups(
+                (2, '2013-04-29T20:00:00+10:00'),
+                (4, '2013-04-30T20:00:00+10:00')),
+            base + 'sites/1/cashups.json': cashups(
+                (1, '2013-04-28T20:00:00+10:00')),
+            base + 'sites/1/cashups/unprocessed.json': cashups(),
+        })
+        pool = ConnectionPool('127.0.0.1', self.server.port, secure=False)
+        self.client = BasicClient('id', 'secret', pool=pool)
+        self.company = Company({'id': 5678}, self.client, None)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        shutil.rmtree(self.directory)
+        TestCase.tearDown(self)
+
+    def paths(self):
+        return [path for path, headers in self.server.requests]
+
+    def test_first_run_fetches_everything(self):
+        sync = CashupSync(self.path, {})
+        self.assertEqual(sync.sync(self.company), 3)
+        self.assertEqual(sorted(sync.store), ['1', '2', '3'])
+        self.assertEqual(sync.marks, {'/v1/companies/5678': '2013-04-29'})
+
+    def test_next_run_fetches_only_the_delta(self):
+        CashupSync(self.path, {}).sync(self.company)
+        del self.server.requests[:]
+
+        store = {}
+        sync = CashupSync(self.path, store)
+        sync.sync(self.company)
+        self.assertEqual(self.paths(), [
+            '/v1/companies/5678/cashups/since/2013-04-29.json',
+            '/v1/companies/5678/cashups/unprocessed.json',
+        ])
+        self.assertEqual(sorted(store), ['2', '3', '4'])
+        # Cashup 3 is still unprocessed.
+        self.assertEqual(sync.marks['/v1/companies/5678'], '2013-04-29')
+
+    def test_unprocessed_cashup_is_fetched_once_processed(self):
+        base = '/v1/companies/5678/'
+        self.server.routes[base + 'cashups/unprocessed.json'] = (
+            200, {}, json.dumps([{'id': 3, 'processed': False,
+                                  'created_at': '2013-04-28T21:00:00+10:00'}]))
+        sync = CashupSync(self.path, {})
+        sync.sync(self.company)
+        self.assertEqual(sync.marks['/v1/companies/5678'], '2013-04-28')
+
+        self.server.routes.update({
+            base + 'cashups/unprocessed.json': cashups(),
+            base + 'cashups/since/2013-04-28.json': (
+                200, {}, json.dumps([
+                    {'id': 3, 'processed': True,
+                     'created_at': '2013-04-28T21:00:00+10:00'},
+                    {'id': 2, 'created_at': '2013-04-29T20:00:00+10:00'}])),
+        })
+        sync = CashupSync(self.path, sync.store)
+        sync.sync(self.company)
+        self.assertTrue(sync.store['3']['processed'])
+        self.assertEqual(sync.marks['/v1/companies/5678'], '2013-04-29')
+
+    def test_shelve_store(self):
+        store = shelve.open(os.path.join(self.directory, 'cashups'))
+        CashupSync(self.path, store).sync(self.company)
+        store.close()
+        store = shelve.open(os.path.join(self.directory, 'cashups'))
+        self.assertEqual(sorted(store), ['1', '2', '3'])
+        store.close()
+
+    def test_merges_into_existing_store(self):
+        store = {'2': {'id': 2, 'stale': True}, '9': {'id': 9}}
+        CashupSync(self.path, store).sync(self.company)
+        self.assertEqual(sorted(store), ['1', '2', '3', '9'])
+        self.assertFalse('stale' in store['2'])
+
+    def test_marks_are_kept_per_object(self):
+        site = Site({'id': 1}, self.client, self.company)
+        sync = CashupSync(self.path, {})
+        sync.sync(self.company, site)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {
+                '/v1/companies/5678': '2013-04-29',
+                '/v1/companies/5678/sites/1': '2013-04-28',
+            })
+
+    def test_failed_run_keeps_the_previous_mark(self):
+        CashupSync(self.path, {}).sync(self.company)
+        del self.server.routes['/v1/companies/5678/cashups/unprocessed.json']
+        sync = CashupSync(self.path, {})
+        self.assertRaises(urllib2.HTTPError, sync.sync, self.company)
+        self.assertEqual(CashupSync(self.path, {}).marks,
+                         {'/v1/companies/5678': '2013-04-29'})
+
+    def test_register(self):
+        self.server.routes.update({
+            '/v1/companies/5678/registers/7/cashups.json': cashups(
+                (5, '2013-04-27T20:00:00+10:00')),
+            '/v1/companies/5678/registers/7/cashups/unprocessed.json':
+                cashups(),
+        })
+        register = Register({'id': 7}, self.client, self.company)
+        sync = CashupSync(self.path, {})
+        self.assertEqual(sync.sync(register), 1)
+
+    def test_other_objects_cannot_be_synced(self):
+        staff = Staff({'id': 1}, self.client, self.company)
+        self.assertRaises(ValueError, CashupSync(self.path, {}).sync, staff)
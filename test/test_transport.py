@@ -0,0 +1,218 @@
+from unittest import TestCase
+from kounta.client import BasicClient
+from kounta.transport import ConnectionPool
+from test.server import StandInServer
+import gc
+import gzip
+import io
+import threading
+import time
+import zlib
+
+
+def gzipped(data):
+    out = io.BytesIO()
+    with gzip.GzipFile(fileobj=out, mode='wb') as f:
+        f.write(data)
+    return out.getvalue()
+
+
+class TestConnectionPool(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.server = StandInServer({
+            '/a.json': (200, {}, '{"a":1}'),
+            '/b.json': (200, {}, '{"b":2}'),
+            '/missing.json': (404, {}, '{}'),
+            '/gzip.json': (200, {'Content-Encoding': 'gzip'},
+                           gzipped(b'[1, 2, 3]')),
+            '/deflate.json': (200, {'Content-Encoding': 'deflate'},
+                              zlib.compress(b'{"d":1}')),
+            '/raw-deflate.json': (200, {'Content-Encoding': 'deflate'},
+                                  zlib.compress(b'{"r":1}')[2:-4]),
+            '/big.json': (200, {}, b'x' * 200000),
+        })
+        self.pool = ConnectionPool('127.0.0.1', self.server.port,
+                                   secure=False, max_size=2)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+        TestCase.tearDown(self)
+
+    def test_request_returns_response(self):
+        response = self.pool.request('GET', '/a.json')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.read(), b'{"a":1}')
+
+    def test_sequential_requests_reuse_one_connection(self):
+        for i in range(5):
+            self.pool.request('GET', '/a.json')
+            self.pool.request('GET', '/b.json')
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.pool.connections_opened, 1)
+
+    def test_error_responses_keep_the_connection(self):
+        self.assertEqual(self.pool.request('GET', '/missing.json').status, 404)
+        self.pool.request('GET', '/a.json')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_never_opens_more_than_max_size(self):
+        threads = [threading.Thread(target=self.pool.request,
+                                    args=('GET', '/a.json'))
+                   for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(self.pool.connections_opened <= 2)
+
+    def test_reap_closes_idle_connections(self):
+        self.pool.idle_timeout = 0
+        self.pool.request('GET', '/a.json')
+        self.assertEqual(self.pool.reap(), 1)
+        self.pool.request('GET', '/a.json')
+        self.assertEqual(self.pool.connections_opened, 2)
+
+    def test_reaper_thread_closes_idle_connections(self):
+        pool = ConnectionPool('127.0.0.1', self.server.port, secure=False,
+                              idle_timeout=0.05)
+        pool.request('GET', '/a.json')
+        time.sleep(0.3)
+        self.assertEqual(pool._idle, [])
+        pool.close()
+
+    def test_dropped_client_stops_its_reaper(self):
+        client = BasicClient('id', 'secret', pool=ConnectionPool(
+            '127.0.0.1', self.server.port, secure=False))
+        client._pool.request('GET', '/a.json')
+        reaper = client._pool._reaper
+        self.assertTrue(reaper.is_alive())
+        del client
+        gc.collect()
+        reaper.join(5)
+        self.assertFalse(reaper.is_alive())
+
+    def test_waiting_request_is_not_starved_by_reaper(self):
+        pool = ConnectionPool('127.0.0.1', self.server.port, secure=False,
+                              max_size=1, idle_timeout=10)
+        # Start the reaper, which then sleeps for idle_timeout / 2.
+        pool.request('GET', '/a.json')
+        response = pool.request('GET', '/big.json', stream=True)
+        waited = []
+
+        def request():
+            start = time.time()
+            pool.request('GET', '/a.json')
+            waited.append(time.time() - start)
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        time.sleep(0.1)
+        response.read()
+        thread.join(5)
+        pool.close()
+        self.assertEqual(len(waited), 1)
+        self.assertTrue(waited[0] < 1, waited)
+
+    def test_request_while_holding_every_connection_uses_the_reserve(self):
+        response = self.pool.request('GET', '/big.json', stream=True)
+        other = self.pool.request('GET', '/big.json', stream=True)
+        self.assertEqual(self.pool.request('GET', '/a.json').read(),
+                         b'{"a":1}')
+        # The reserved connection is closed once it is given back.
+        self.assertEqual(self.pool._open, 2)
+        response.read()
+        other.read()
+        self.assertEqual(self.pool.connections_opened, 3)
+
+    def test_request_while_holding_the_reserve_raises(self):
+        response = self.pool.request('GET', '/big.json', stream=True)
+        other = self.pool.request('GET', '/big.json', stream=True)
+        reserved = self.pool.request('GET', '/big.json', stream=True)
+        self.assertRaises(RuntimeError, self.pool.request, 'GET', '/a.json')
+        for r in (response, other, reserved):
+            r.read()
+        self.assertEqual(self.pool.request('GET', '/a.json').read(),
+                         b'{"a":1}')
+
+    def test_thread_without_a_connection_does_not_take_the_reserve(self):
+        response = self.pool.request('GET', '/big.json', stream=True)
+        other = self.pool.request('GET', '/big.json', stream=True)
+        done = threading.Event()
+
+        def request():
+            self.pool.request('GET', '/a.json')
+            done.set()
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        self.assertFalse(done.wait(0.2))
+        response.read()
+        self.assertTrue(done.wait(5))
+        other.read()
+        thread.join()
+
+    def test_gzip_is_decompressed(self):
+        response = self.pool.request('GET', '/gzip.json')
+        self.assertEqual(response.read(), b'[1, 2, 3]')
+        self.assertEqual(response.size, 9)
+
+    def test_deflate_is_decompressed(self):
+        self.assertEqual(self.pool.request('GET', '/deflate.json').read(),
+                         b'{"d":1}')
+        self.assertEqual(self.pool.request('GET', '/raw-deflate.json').read(),
+                         b'{"r":1}')
+
+    def test_streamed_body_releases_connection_when_read(self):
+        response = self.pool.request('GET', '/big.json', stream=True)
+        chunks = list(response.iter_chunks())
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(sum(map(len, chunks)), 200000)
+        self.pool.request('GET', '/a.json')
+        self.assertEqual(self.pool.connections_opened, 1)
+
+    def test_abandoned_stream_closes_connection(self):
+        response = self.pool.request('GET', '/big.json', stream=True)
+        chunks = response.iter_chunks()
+        next(chunks)
+        chunks.close()
+        self.assertEqual(self.pool._open, 0)
+        self.assertEqual(self.pool.request('GET', '/a.json').read(),
+                         b'{"a":1}')
+
+    def test_closed_pool_refuses_requests(self):
+        self.pool.close()
+        self.assertRaises(RuntimeError, self.pool.request, 'GET', '/a.json')
+
+
+class TestBasicClientPool(TestCase):
+    def setUp(self):
+        TestCase.setUp(self)
+        self.server = StandInServer({
+            '/v1/companies/me.json': (200, {}, '{"id":5678}'),
+            '/v1/companies/5678/sites.json': (200, {}, '[]'),
+        })
+        pool = ConnectionPool('127.0.0.1', self.server.port, secure=False)
+        self.client = BasicClient('id', 'secret', pool=pool)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        TestCase.tearDown(self)
+
+    def test_walking_endpoints_uses_one_connection(self):
+        self.assertEqual(self.client.company.sites, [])
+        self.assertEqual(self.server.connections, 1)
+
+    def test_decodes_compressed_responses(self):
+        self.server.routes['/v1/companies/5678/sites.json'] = (
+            200, {'Content-Encoding': 'gzip'}, gzipped(b'[{"id": 1}]'))
+        self.assertEqual(self.client.company.sites[0].id, 1)
+        headers = self.server.requests[0][1]
+        self.assertEqual(headers['accept-encoding'], 'gzip, deflate')
+
+    def test_sends_basic_authorization(self):
+        self.client.get_url('/v1/companies/me.json')
+        headers = self.server.requests[0][1]
+        self.assertEqual(headers['authorization'], 'Basic aWQ6c2VjcmV0')